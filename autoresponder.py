@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+KEYWORDS_PATH = os.getenv(
+    "AUTORESPONDER_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "keywords.json"))
+CHANNEL_COOLDOWN = 30.0
+KEYWORD_COOLDOWN = 120.0
+# Bounds the cooldown table; the oldest entries are dropped first
+COOLDOWN_ENTRIES = int(os.getenv("AUTORESPONDER_COOLDOWN_ENTRIES", "4096"))
+# Seconds between checks of the config file's mtime
+RELOAD_CHECK_INTERVAL = 5.0
+
+
+def compile_keywords(rules):
+    """One case-insensitive alternation over every keyword, matched on word boundaries.
+
+    Longer keywords are tried first so "nerd cafe" wins over "nerd". Each
+    keyword gets a named group so the match maps straight back to its rule.
+    """
+    ordered = sorted(enumerate(rules), key=lambda r: -len(r[1]['keyword']))
+    alternatives = []
+    for i, rule in ordered:
+        words = rule['keyword'].split()
+        alternatives.append(f"(?P<k{i}>" + r"\s+".join(re.escape(w) for w in words) + ")")
+    return re.compile(r"(?<!\w)(?:" + "|".join(alternatives) + r")(?!\w)", re.IGNORECASE)
+
+
+class Autoresponder:
+    """Keyword replies loaded from a JSON config.
+
+    The config looks like::
+
+        {"channel_cooldown": 30, "keyword_cooldown": 120,
+         "keywords": [{"keyword": "nerd cafe", "response": "https://nerdcafe.org/"},
+                      {"keyword": "ib", "response": "...", "guilds": [1234]}]}
+
+    Rules without ``guilds`` apply everywhere. Each guild's rules are compiled
+    into a single regex on first use, and the file is reloaded when its mtime
+    changes, so edits take effect without a restart.
+    """
+
+    def __init__(self, path=KEYWORDS_PATH, max_cooldowns=COOLDOWN_ENTRIES, clock=time.monotonic):
+        self.path = path
+        self.max_cooldowns = max_cooldowns
+        self.clock = clock
+        self.rules = []
+        self.channel_cooldown = CHANNEL_COOLDOWN
+        self.keyword_cooldown = KEYWORD_COOLDOWN
+        self._mtime = None
+        self._next_check = 0.0
+        self._compiled = {}                # guild id -> (pattern, rules) or None
+        self._cooldowns = OrderedDict()    # key -> time the cooldown ends
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Re-read the config. A missing or invalid file keeps the current rules."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, encoding="utf-8") as f:
+                config = json.load(f)
+            rules = [r for r in config.get("keywords", []) if r.get("keyword", "").strip() and r.get("response")]
+            for rule in rules:
+                if rule.get("guilds"):
+                    rule["guilds"] = {int(g) for g in rule["guilds"]}
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, AttributeError):
+            logger.exception("autoresponder_config_invalid path=%s", self.path)
+            return False
+        with self._lock:
+            self.rules = rules
+            self.channel_cooldown = float(config.get("channel_cooldown", CHANNEL_COOLDOWN))
+            self.keyword_cooldown = float(config.get("keyword_cooldown", KEYWORD_COOLDOWN))
+            self._mtime = mtime
+            self._compiled.clear()
+        logger.info("autoresponder_loaded path=%s keywords=%d", self.path, len(rules))
+        return True
+
+    def _maybe_reload(self, now):
+        if now < self._next_check:
+            return
+        self._next_check = now + RELOAD_CHECK_INTERVAL
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def _matcher(self, guild_id):
+        with self._lock:
+            if guild_id in self._compiled:
+                return self._compiled[guild_id]
+            rules = [r for r in self.rules if not r.get("guilds") or guild_id in r["guilds"]]
+            matcher = (compile_keywords(rules), rules) if rules else None
+            self._compiled[guild_id] = matcher
+            return matcher
+
+    def _cooling(self, key, now):
+        until = self._cooldowns.get(key)
+        return until is not None and until > now
+
+    def _start_cooldown(self, key, seconds, now):
+        self._cooldowns[key] = now + seconds
+        self._cooldowns.move_to_end(key)
+        while len(self._cooldowns) > self.max_cooldowns:
+            self._cooldowns.popitem(last=False)
+
+    def reply_for(self, content, guild_id, channel_id):
+        """Return the response to post for ``content``, or None."""
+        now = self.clock()
+        self._maybe_reload(now)
+        matcher = self._matcher(guild_id)
+        if matcher is None:
+            return None
+        pattern, rules = matcher
+        with self._lock:
+            if self._cooling(("channel", channel_id), now):
+                return None
+            for match in pattern.finditer(content):
+                rule = rules[int(match.lastgroup[1:])]
+                keyword_key = ("keyword", channel_id, rule['keyword'].casefold())
+                if self._cooling(keyword_key, now):
+                    continue
+                self._start_cooldown(("channel", channel_id), self.channel_cooldown, now)
+                self._start_cooldown(keyword_key, self.keyword_cooldown, now)
+                return rule['response']
+        return None
+
+
+_responder = None
+_responder_lock = threading.Lock()
+
+
+def get_autoresponder():
+    global _responder
+    with _responder_lock:
+        if _responder is None:
+            _responder = Autoresponder()
+        return _responder
@@ -0,0 +1,203 @@
+"""In-memory stand-in for the Drive v3 service used by the bot.
+
+Implements the subset of the API the Drive modules call:
+
+* ``files().list(q=..., pageSize=..., pageToken=...)`` with ``'id' in parents``
+  clauses joined by ``or``, ``mimeType = '...'`` filters and pagination
+* ``files().get_media(fileId=...)`` served through a fake HTTP transport that
+  honours the ``Range`` headers sent by ``MediaIoBaseDownload``
+* ``changes().getStartPageToken()`` and ``changes().list(pageToken=...)``
+
+``latency`` adds a fixed delay to every request to approximate a network
+round trip and ``fail_rate`` makes that fraction of requests fail with a 503.
+"""
+import hashlib
+import random
+import re
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+PDF_MIME = 'application/pdf'
+
+PARENT_RE = re.compile(r"'([^']+)' in parents")
+MIME_RE = re.compile(r"mimeType\s*=\s*'([^']+)'")
+
+
+class _Response(dict):
+    # Mimics the httplib2 response object: a header dict with a status
+    def __init__(self, status, headers=None):
+        super().__init__(headers or {})
+        self.status = status
+        self['status'] = str(status)
+        self.reason = "Service Unavailable" if status == 503 else "OK"
+
+
+class FakeRequest:
+    def __init__(self, drive, method, uri, fn):
+        self.drive = drive
+        self.method = method
+        self.uri = uri
+        self.body = None
+        self._fn = fn
+
+    def execute(self, **kwargs):
+        self.drive._round_trip(self.uri)
+        return self._fn()
+
+
+class FakeHttp:
+    """Transport for ``MediaIoBaseDownload``; returns 206 responses for byte ranges."""
+
+    def __init__(self, drive, data):
+        self.drive = drive
+        self.data = data
+
+    def request(self, uri, method="GET", headers=None, **kwargs):
+        self.drive._round_trip(uri)
+        headers = headers or {}
+        rng = headers.get('range') or headers.get('Range')
+        total = len(self.data)
+        if not rng:
+            return _Response(200, {'content-length': str(total)}), self.data
+        start, end = rng.split('=', 1)[1].split('-')
+        start, end = int(start), min(int(end), total - 1)
+        body = self.data[start:end + 1]
+        self.drive.bytes_served += len(body)
+        return _Response(206, {'content-range': f'bytes {start}-{end}/{total}'}), body
+
+
+class FakeMediaRequest:
+    def __init__(self, drive, file_id):
+        self.http = FakeHttp(drive, drive.content[file_id])
+        self.uri = f"fake://drive/files/{file_id}?alt=media"
+        self.headers = {}
+
+
+class _Files:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def list(self, q="", fields=None, pageSize=100, pageToken=None, **kwargs):
+        drive = self.drive
+
+        def run():
+            parents = set(PARENT_RE.findall(q))
+            mimes = set(MIME_RE.findall(q))
+            with drive._lock:
+                ids = sorted(i for p in parents for i in drive.children.get(p, ()))
+                matches = [drive.items[i] for i in ids
+                           if not mimes or drive.items[i]['mimeType'] in mimes]
+            start = int(pageToken or 0)
+            page = matches[start:start + pageSize]
+            response = {'files': [dict(f) for f in page]}
+            if start + pageSize < len(matches):
+                response['nextPageToken'] = str(start + pageSize)
+            return response
+
+        return FakeRequest(drive, "GET", f"fake://drive/files?q={q}&pageToken={pageToken}", run)
+
+    def get(self, fileId, fields=None, **kwargs):
+        return FakeRequest(self.drive, "GET", f"fake://drive/files/{fileId}",
+                           lambda: dict(self.drive.items[fileId]))
+
+    def get_media(self, fileId, **kwargs):
+        return FakeMediaRequest(self.drive, fileId)
+
+
+class _Changes:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        return FakeRequest(self.drive, "GET", "fake://drive/changes/startPageToken",
+                           lambda: {'startPageToken': str(len(self.drive.changes_log))})
+
+    def list(self, pageToken, pageSize=100, **kwargs):
+        drive = self.drive
+
+        def run():
+            start = int(pageToken)
+            with drive._lock:
+                log = drive.changes_log
+                page = log[start:start + pageSize]
+                if start + pageSize < len(log):
+                    return {'changes': page, 'nextPageToken': str(start + pageSize)}
+                return {'changes': page, 'newStartPageToken': str(len(log))}
+
+        return FakeRequest(drive, "GET", f"fake://drive/changes?pageToken={pageToken}", run)
+
+
+class FakeDrive:
+    def __init__(self, latency=0.0, fail_rate=0.0, seed=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.items = {}
+        self.content = {}
+        self.children = {}
+        self.changes_log = []
+        self.requests = 0
+        self.failures = 0
+        self.bytes_served = 0
+        self._ids = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    # ---- building the tree ----
+    def _new_id(self):
+        self._ids += 1
+        return f"fake{self._ids:07d}"
+
+    def _add(self, name, mime_type, parent, data=None):
+        file_id = self._new_id()
+        item = {
+            'id': file_id,
+            'name': name,
+            'mimeType': mime_type,
+            'parents': [parent],
+            'modifiedTime': time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+        }
+        if data is not None:
+            item['md5Checksum'] = hashlib.md5(data).hexdigest()
+            self.content[file_id] = data
+        with self._lock:
+            self.items[file_id] = item
+            self.children.setdefault(parent, []).append(file_id)
+            self.changes_log.append({'fileId': file_id, 'removed': False, 'file': dict(item)})
+        return file_id
+
+    def add_folder(self, name, parent):
+        return self._add(name, FOLDER_MIME, parent)
+
+    def add_pdf(self, name, parent, data):
+        return self._add(name, PDF_MIME, parent, data)
+
+    def remove(self, file_id):
+        with self._lock:
+            item = self.items.pop(file_id)
+            self.content.pop(file_id, None)
+            self.children[item['parents'][0]].remove(file_id)
+            self.changes_log.append({'fileId': file_id, 'removed': True})
+
+    # ---- service surface ----
+    def files(self):
+        return _Files(self)
+
+    def changes(self):
+        return _Changes(self)
+
+    def _round_trip(self, uri):
+        with self._lock:
+            self.requests += 1
+            fail = self.fail_rate and self._random.random() < self.fail_rate
+            if fail:
+                self.failures += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise HttpError(_Response(503), b'{"error": {"message": "backendError"}}', uri=uri)
+
+    def stats(self):
+        return {'requests': self.requests, 'failures': self.failures, 'bytes_served': self.bytes_served}
@@ -0,0 +1,192 @@
+"""Offline benchmark of the question pipeline against a fake Drive.
+
+    python -m benchmarks.pipeline_bench [--papers 40] [--depth 3] [--iterations 50]
+        [--latency-ms 20] [--fail-rate 0.01] [--output results.json] [--compare baseline.json]
+
+A synthetic CIE corpus is generated into an in-memory Drive and every stage
+runs with its caches and indexes in a temporary directory, so no credentials
+or network are needed. Each benchmark reports the cold first call, warm
+p50/p99 latency, throughput and the tracemalloc peak. ``--compare`` prints the
+change against a previous results file and exits non-zero if any p50 got
+slower by more than ``--threshold``.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fake_drive import FakeDrive
+from benchmarks.synthetic_corpus import SUBJECT_SYLLABUS, build_corpus
+
+MEMORY_SAMPLES = 5
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+def measure(fn, iterations):
+    started = time.perf_counter()
+    fn(0)
+    cold = time.perf_counter() - started
+
+    timings = []
+    for i in range(1, iterations + 1):
+        started = time.perf_counter()
+        fn(i)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    total = sum(timings)
+
+    # tracemalloc slows allocation-heavy code down, so memory gets its own pass
+    tracemalloc.start()
+    for i in range(MEMORY_SAMPLES):
+        fn(iterations + 1 + i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'cold_ms': round(cold * 1000, 2),
+        'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+        'throughput_per_s': round(iterations / total, 2) if total else None,
+        'peak_mem_kib': round(peak / 1024, 1),
+    }
+
+
+def run(args, workdir):
+    # Every on-disk cache and index goes to the scratch directory
+    os.environ.update({
+        'DRIVE_INDEX_PATH': os.path.join(workdir, "drive_index.db"),
+        'PDF_CACHE_DIR': os.path.join(workdir, "pdfs"),
+        'MARK_SCHEME_CACHE_PATH': os.path.join(workdir, "mark_schemes.db"),
+        'SEGMENT_INDEX_PATH': os.path.join(workdir, "question_index.db"),
+    })
+    import drive_access
+    import drive_utils
+    from pdf_cache import get_pdf_cache
+    from render import render_cache
+
+    drive = FakeDrive(latency=args.latency_ms / 1000.0, fail_rate=args.fail_rate, seed=args.seed)
+    started = time.perf_counter()
+    roots = build_corpus(drive, args.subjects, papers=args.papers, depth=args.depth)
+    corpus_seconds = time.perf_counter() - started
+
+    drive_utils.get_drive_service = lambda: drive
+    drive_utils.FOLDER_IDS.clear()
+    drive_utils.FOLDER_IDS.update(roots)
+    # No quota limit against the fake, and short backoff for injected failures
+    drive_access._access = drive_access.DriveAccess(
+        limiter=drive_access.TokenBucket(1e9, 10 ** 9),
+        retry=drive_access.RetryPolicy(base_delay=0.005, max_delay=0.05),
+    )
+
+    subject = args.subjects[0]
+    root = roots[subject]
+    downloaded = []
+
+    def list_pdfs(i):
+        drive_utils.list_pdfs_in_folder(drive, root)
+
+    def download(i):
+        downloaded.append(drive_utils.download_random_pdf(drive, root, subject))
+
+    def extract(i):
+        path, _ = downloaded[i % len(downloaded)]
+        # A fresh cache key per call so every iteration really renders
+        drive_utils.extract_question_image_and_text(path, cache_key=f"bench-{i}")
+
+    def match_mark_scheme(i):
+        _, name = downloaded[i % len(downloaded)]
+        drive_utils.find_matching_mark_scheme(name, drive, subject)
+
+    def full_pipeline(i):
+        drive_utils.get_question_and_mark_scheme(subject)
+
+    results = {}
+    for name, fn in (("list_pdfs_in_folder", list_pdfs),
+                     ("download_random_pdf", download),
+                     ("extract_question_image_and_text", extract),
+                     ("find_matching_mark_scheme", match_mark_scheme),
+                     ("get_question_and_mark_scheme", full_pipeline)):
+        results[name] = measure(fn, args.iterations)
+        print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+
+    return {
+        'config': {
+            'subjects': list(args.subjects),
+            'papers': args.papers,
+            'depth': args.depth,
+            'iterations': args.iterations,
+            'latency_ms': args.latency_ms,
+            'fail_rate': args.fail_rate,
+            'files': len(drive.items),
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'corpus_seconds': round(corpus_seconds, 2),
+        'results': results,
+        'drive': dict(drive.stats(), **drive_access.get_drive_access().stats()),
+        'pdf_cache': get_pdf_cache().stats(),
+        'render_cache': render_cache.stats(),
+    }
+
+
+def compare(current, baseline, threshold):
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before or not before.get('p50_ms'):
+            print(f"{name}: no baseline")
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms']
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name}: p50 {before['p50_ms']} -> {result['p50_ms']} ms ({change:+.1%}), "
+              f"p99 {before['p99_ms']} -> {result['p99_ms']} ms, "
+              f"peak {before['peak_mem_kib']} -> {result['peak_mem_kib']} KiB{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subjects", nargs="+", default=["mathematics"], choices=sorted(SUBJECT_SYLLABUS))
+    parser.add_argument("--papers", type=int, default=30, help="question papers per subject")
+    parser.add_argument("--depth", type=int, default=2, choices=[1, 2, 3])
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated Drive round trip")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of Drive requests that 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p50 slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        current = run(args, workdir)
+
+    print(json.dumps(current, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Average marking prompt size with the whole mark scheme vs. one question's rows.
+
+    python -m benchmarks.prompt_size_report [ms.pdf ...]
+
+With no arguments it reports over every mark scheme already in the
+extracted-text cache. Token counts are estimated at four characters per token.
+"""
+import json
+import sys
+
+from mark_schemes import extract_mark_scheme, get_mark_scheme_cache
+from marking_ai import build_prompt
+
+SAMPLE_QUESTION = "Work out the value of x."
+SAMPLE_ANSWER = "x = 4"
+
+
+def main(paths):
+    if paths:
+        schemes = [(path, *extract_mark_scheme(path)) for path in paths]
+    else:
+        schemes = get_mark_scheme_cache().all()
+
+    full_sizes = []
+    slice_sizes = []
+    for _, text, slices in schemes:
+        full = len(build_prompt(SAMPLE_QUESTION, SAMPLE_ANSWER, text))
+        # Each question is equally likely to be marked
+        for part in slices.values() or [text]:
+            full_sizes.append(full)
+            slice_sizes.append(len(build_prompt(SAMPLE_QUESTION, SAMPLE_ANSWER, part)))
+
+    if not full_sizes:
+        print("No mark schemes to report on.")
+        return
+
+    before = sum(full_sizes) / len(full_sizes)
+    after = sum(slice_sizes) / len(slice_sizes)
+    print(json.dumps({
+        'mark_schemes': len(schemes),
+        'questions': len(slice_sizes),
+        'avg_prompt_chars_before': round(before),
+        'avg_prompt_chars_after': round(after),
+        'avg_prompt_tokens_before': round(before / 4),
+        'avg_prompt_tokens_after': round(after / 4),
+        'reduction': f"{(1 - after / before) * 100:.1f}%",
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
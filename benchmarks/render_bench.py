@@ -0,0 +1,111 @@
+"""Compare the old pdf2image question render with the PyMuPDF render engine.
+
+Each path runs in its own subprocess so peak RSS is measured in isolation:
+
+    python -m benchmarks.render_bench [paper.pdf] [--runs 5]
+
+Without a PDF argument a synthetic multi-page paper is generated. The
+pdf2image path needs ``pip install -r benchmarks/requirements.txt`` and
+poppler, and is skipped otherwise.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def make_sample_pdf(path, pages=12):
+    import fitz
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"{n + 1}  Answer all questions in the spaces provided.", fontsize=11)
+        for line in range(40):
+            page.insert_text((72, 100 + line * 17), f"({chr(97 + line % 8)}) Calculate the value of x when 3x + {line} = {line * 4}.", fontsize=10)
+        page.draw_rect(fitz.Rect(300, 500, 520, 700))
+    doc.save(path)
+    doc.close()
+
+
+def run_old(pdf_path, runs):
+    from pdf2image import convert_from_path
+    import fitz
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        images = convert_from_path(pdf_path, first_page=1, last_page=1)
+        img_path = pdf_path.replace(".pdf", ".png")
+        images[0].save(img_path, 'PNG')
+        doc = fitz.open(pdf_path)
+        doc[0].get_text()
+        doc.close()
+        with open(img_path, 'rb') as f:
+            size = len(f.read())
+        timings.append(time.perf_counter() - start)
+    return timings, size
+
+
+def run_new(pdf_path, runs, fmt):
+    import render
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        # Fresh cache key per run so every iteration really renders
+        data, _ = render.render_region(pdf_path, fmt=fmt, cache_key=f"bench-{i}")
+        render.as_file_buffer(data, fmt=fmt)
+        timings.append(time.perf_counter() - start)
+    return timings, len(data)
+
+
+def child(mode, pdf_path, runs, fmt):
+    if mode == "old":
+        timings, size = run_old(pdf_path, runs)
+    else:
+        timings, size = run_new(pdf_path, runs, fmt)
+    timings.sort()
+    print(json.dumps({
+        'mode': mode if mode == "old" else f"pymupdf-{fmt}",
+        'runs': runs,
+        'median_ms': round(timings[len(timings) // 2] * 1000, 1),
+        'min_ms': round(timings[0] * 1000, 1),
+        # ru_maxrss is KiB on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'image_bytes': size,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf", nargs="?")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", choices=["old", "new"])
+    parser.add_argument("--format", default="png")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.pdf, args.runs, args.format)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if not pdf_path:
+            pdf_path = os.path.join(tmp, "0580_s23_qp_42.pdf")
+            make_sample_pdf(pdf_path)
+        for mode, fmt in (("old", "png"), ("new", "png"), ("new", "webp")):
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.render_bench", pdf_path,
+                 "--runs", str(args.runs), "--child", mode, "--format", fmt],
+                capture_output=True, text=True)
+            if proc.returncode != 0:
+                last = proc.stderr.strip().splitlines()[-1:] or ["failed"]
+                print(f"{mode}/{fmt}: skipped ({last[0]})")
+                continue
+            print(proc.stdout.strip())
+
+
+if __name__ == "__main__":
+    main()
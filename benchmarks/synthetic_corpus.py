@@ -0,0 +1,115 @@
+"""Synthetic CIE past-paper corpus for offline benchmarks.
+
+Question papers have a cover page followed by numbered questions in the left
+margin; mark schemes have a Question / Answer / Marks table. Both follow the
+layouts ``question_segments`` and ``mark_schemes`` expect, and every file
+carries its own name so md5 checksums differ.
+"""
+import itertools
+
+import fitz  # PyMuPDF
+
+from catalog import PAST_PAPERS, get_catalog
+
+# Subjects the question pipeline serves, with their syllabus codes and theory
+# paper numbers, straight from subjects.json
+THEORY_PAPERS = {key: sorted(papers) for key, papers in get_catalog().theory_papers(PAST_PAPERS, "CIE").items()}
+SUBJECT_SYLLABUS = {key: get_catalog().subjects[key].syllabus for key in THEORY_PAPERS}
+
+SESSIONS = ("m", "s", "w")
+
+
+def make_question_paper(name, questions=6, pages=8):
+    doc = fitz.open()
+    cover = doc.new_page()
+    cover.insert_text((72, 120), f"Cambridge IGCSE  {name}", fontsize=16)
+    cover.insert_text((72, 160), "READ THESE INSTRUCTIONS FIRST", fontsize=11)
+    per_page = max(1, -(-questions // (pages - 1)))
+    number = 1
+    for _ in range(pages - 1):
+        page = doc.new_page()
+        y = 90
+        for _ in range(per_page):
+            if number > questions:
+                break
+            page.insert_text((40, y), str(number), fontsize=11)
+            for line in range(6):
+                page.insert_text((72, y + line * 16),
+                                 f"({chr(97 + line % 4)}) Calculate the value of x when {number}x + {line} = {line * 7}.",
+                                 fontsize=10)
+            page.draw_rect(fitz.Rect(72, y + 100, 520, y + 180))
+            y += 220
+            number += 1
+        page.insert_text((280, 810), "© UCLES", fontsize=8)
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+
+def make_mark_scheme(name, questions=6):
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 80), f"{name}  Generic Marking Principles", fontsize=11)
+    y = 120
+    page.insert_text((40, y), "Question", fontsize=10)
+    page.insert_text((200, y), "Answer", fontsize=10)
+    page.insert_text((480, y), "Marks", fontsize=10)
+    y += 30
+    for number in range(1, questions + 1):
+        for part in "abc":
+            if y > 780:
+                page = doc.new_page()
+                y = 80
+            page.insert_text((40, y), f"{number}({part})", fontsize=10)
+            page.insert_text((200, y), f"x = {number * 3} cao", fontsize=10)
+            page.insert_text((480, y), "2", fontsize=10)
+            y += 28
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+
+def _sittings():
+    for year in itertools.count(23, -1):
+        for session in SESSIONS:
+            yield year % 100, session
+
+
+def build_corpus(drive, subjects=tuple(SUBJECT_SYLLABUS), papers=20, depth=2, questions=6):
+    """Populate ``drive`` and return ``{subject: root_folder_id}``.
+
+    ``papers`` question papers (each with its mark scheme) are created per
+    subject, alternating between the subject's theory papers and variants 1-3. ``depth``
+    controls nesting: 1 puts files straight in the subject folder, 2 adds a
+    folder per year, 3 also adds a folder per session.
+    """
+    roots = {}
+    for subject in subjects:
+        syllabus = SUBJECT_SYLLABUS[subject]
+        root = drive.add_folder(f"{subject} past papers", parent="root")
+        roots[subject] = root
+        folders = {}
+        sittings = _sittings()
+        made = 0
+        while made < papers:
+            year, session = next(sittings)
+            for paper, variant in itertools.product(THEORY_PAPERS[subject], (1, 2, 3)):
+                if made >= papers:
+                    break
+                parent = root
+                if depth >= 2:
+                    key = (year,)
+                    if key not in folders:
+                        folders[key] = drive.add_folder(f"20{year:02d}", parent=root)
+                    parent = folders[key]
+                if depth >= 3:
+                    key = (year, session)
+                    if key not in folders:
+                        folders[key] = drive.add_folder(session, parent=parent)
+                    parent = folders[key]
+                qp = f"{syllabus}_{session}{year:02d}_qp_{paper}{variant}.pdf"
+                ms = f"{syllabus}_{session}{year:02d}_ms_{paper}{variant}.pdf"
+                drive.add_pdf(qp, parent, make_question_paper(qp, questions))
+                drive.add_pdf(ms, parent, make_mark_scheme(ms, questions))
+                made += 1
+    return roots
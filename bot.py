@@ -1,12 +1,35 @@
+import time
+_process_started = time.perf_counter()
+
 import os
+import sys
+import asyncio
+import logging
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 from dotenv import load_dotenv
-from collections import defaultdict
+from autoresponder import get_autoresponder
+from catalog import NOTES, PAST_PAPERS, get_catalog
+import paper_lookup
+from paper_codes import SESSIONS
+from link_store import get_link_store
+from jobs import get_maintenance_runner, run_for_interaction
+from paper_search import get_search_index, update_folders
+from command_sync import sync_if_changed
+from scheduler import DailyScheduler, parse_time, pending_slot, slot_start
+import metrics
+from metrics import COMMAND_SECONDS, ERRORS
+# Drive, PyMuPDF and OpenAI are only imported by the code paths that use them
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"),
+                    format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger("bot")
+startup = metrics.PhaseTimer(_process_started)
+startup.mark("imports")
 
 # --------- FLASK INTEGRATION ---------
-from flask import Flask
+from flask import Flask, Response
 from threading import Thread
 
 app = Flask(__name__)
@@ -15,6 +38,10 @@ app = Flask(__name__)
 def home():
     return "IGCSE Discord Bot is running!"
 
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 def run_flask():
     app.run(host="0.0.0.0", port=5000)
 
@@ -28,55 +55,36 @@ ADDNOTES_CHANNEL_ID = 1377955545071357983  # The channel where all notes/links s
 
 # --------- DATA STRUCTURES ---------
 
-PAST_PAPER_BOARDS = {
-    "CIE": {
-        "mathematics": "https://drive.google.com/drive/folders/1GZUs34yS5dMmhO8Pm8rWokkS7VBQ5bqF?usp=sharing",
-        "biology": "https://drive.google.com/drive/folders/1tCMnYUtHJ1jQAqmagUw1h5pWrtHxNwYE?usp=sharing",
-        "chemistry": "https://drive.google.com/drive/folders/1Ji-VoRovspqnZtvxhJW1CCdeMilxQBCX?usp=sharing",
-        "physics": "https://drive.google.com/drive/folders/1Baa4OKIzjjtHzwcy1-xwjBuCDMLh2FlW?usp=sharing",
-        "geography": "https://drive.google.com/drive/folders/1xofPQTwhu7pUS0KqO7ielXj0fvmRBTuH?usp=sharing",
-        "information and communication technology": "https://drive.google.com/drive/folders/1CnorPO8wNZNkjvQ6LwzkINZXRo24T6-1?usp=sharing",
-        "business studies": "https://drive.google.com/drive/folders/1EWccBxwaoV4sjCSHG4DadcpIXUVqtdap?usp=sharing",
-        "accounting": "https://drive.google.com/drive/folders/1BEumj8GOd4x0UOVkk8Cq5o5guTgBSeo2?usp=sharing",
-        "computer science": "https://drive.google.com/drive/folders/1-CQZbc8dAxai2Qw-bpddpDudpSIASiaT?usp=sharing",
-        "french - foreign language": "https://drive.google.com/drive/folders/18Hpg4LjOnw7KgRmXqtAq6MTbM5bpwBFx?usp=sharing",
-        "literature in english": "https://drive.google.com/drive/folders/1aNqqrZ6Orl1qyBNsLr8BPhuezofGgXGi?usp=sharing",
-        "english - first language": "https://drive.google.com/drive/folders/1YHvXgahzgsFwkcg3vzpHSrVdj_GnCq7E?usp=sharing",
-        "history": "https://drive.google.com/drive/folders/1A1OHb2CW5cmCSyQf_cqZGemNQtskhgL_?usp=sharing",
-        "global perspectives": "https://drive.google.com/drive/folders/1lTj44aH3tLLEbfK0Tnb5WFG1cwKV3tEJ?usp=sharing",
-        "enterprise": "https://drive.google.com/drive/folders/187ppeu_FyUskOb8--2KOqVrGnkcIVHe5?usp=sharing",
-        "economics": "https://drive.google.com/drive/folders/1lU4WqKULYiCJzCKPVJYDwsvFVudRB-as?usp=sharing",
-    }
-}
-PAST_PAPER_BOARD_NAMES = list(PAST_PAPER_BOARDS.keys())
-PAST_PAPER_SUBJECTS = list(PAST_PAPER_BOARDS["CIE"].keys())
-
-NOTES_BOARDS = ["IGCSE", "CBSE"]
-
-NOTES_IGCSE_SUBJECTS = {
-    "accounting": "https://drive.google.com/drive/folders/1qelX7sXIIxdk_v_bLxJRkbpfuBOfDFno",
-    "biology": "https://drive.google.com/drive/folders/1mrh6_cdYUKTGvEN5UyBsLMacRzdsQQtz",
-    "business studies": "https://drive.google.com/drive/folders/1JKujjCHyUhNM5y8tfonFrZ7ZPS8oH6Fe",
-    "chemistry": "https://drive.google.com/drive/folders/1AgLXQz-dPLtpyvDgRVLnQtS7NVoUjtPp",
-    "maths": "https://drive.google.com/drive/folders/1HlOXZYhJhEhz9e8KXVoOSr9lM9RQbXQ3",
-    "physics": "https://drive.google.com/drive/folders/1_jnbXYTAVVVDvS-uHs4KQYbyZke5V5Bl",
-    "urdu": "https://drive.google.com/drive/folders/1fXFImXjkvudt3FlqLTH8jCDdZX_LLfDf",
-}
-NOTES_IGCSE_SUBJECT_LIST = list(NOTES_IGCSE_SUBJECTS.keys())
+# Subjects, aliases and Drive folders per board all live in subjects.json
+catalog = get_catalog()
+PAST_PAPER_BOARD_NAMES = catalog.boards(PAST_PAPERS)
+NOTES_BOARDS = catalog.boards(NOTES)
 
-NOTES_CBSE_YEAR_GROUPS = {
-    "Class 10": "https://drive.google.com/drive/folders/11MWj0Byg9Chzn-wxg2_agje8hDaK7JpD",
-    "Class 9": "https://drive.google.com/drive/folders/11GTAGG4PCZgN6-qWVCcDgUrpx2ImQ2-H",
+# Drive folder ids of the CIE past-paper folders, for the /searchpapers index
+SEARCH_FOLDERS = {
+    subject.key: catalog.folder_id(PAST_PAPERS, "CIE", subject.key)
+    for subject in catalog.subjects_for(PAST_PAPERS, "CIE")
 }
-
-# Stores user-shared links: {(group, subject): [link1, ...]}
-user_shared_links = defaultdict(list)
+SEARCH_REFRESH_HOURS = 6
+AUTOCOMPLETE_TIMEOUT = 2.0
+
+# User-shared links, stored per (group, subject) and read a page at a time
+link_store = get_link_store()
+# Links shared under an alias ("maths") are filed under the subject key ("mathematics");
+# runs once per database
+moved_links = link_store.migrate_subject_keys(catalog.legacy_names())
+if moved_links:
+    logger.info("shared_links_migrated moved=%d", moved_links)
+autoresponder = get_autoresponder()
+# Subjects that have theory papers to draw daily questions from
+DAILY_SUBJECTS = catalog.theory_papers(PAST_PAPERS, "CIE")
 
 # --------- DISCORD SETUP ---------
 intents = discord.Intents.default()
 intents.message_content = True
 bot = commands.Bot(command_prefix="/", intents=intents)
 tree = bot.tree
+daily_scheduler = DailyScheduler(bot)
 
 # --------- KEYWORD AUTORESPONDER ---------
 @bot.event
@@ -84,28 +92,109 @@ async def on_message(message):
     if message.author.bot:
         return
 
-    content = message.content.lower()
-    if "bestgradez" in content:
-        await message.channel.send("https://bestgradez.com/")
-    elif "nerd cafe" in content:
-        await message.channel.send("https://nerdcafe.org/")
+    # Keywords and responses live in keywords.json and reload on edit
+    reply = autoresponder.reply_for(message.content, message.guild.id if message.guild else None, message.channel.id)
+    if reply:
+        await message.channel.send(reply)
     await bot.process_commands(message)
 
+# --------- USER SHARED LINKS ---------
+def format_shared_links(links, next_cursor, start=1):
+    """Render as many links as fit in one embed field.
+
+    Returns ``(text, shown, next_cursor)``. Embed field values are capped at
+    1024 characters, so when the page is cut short the cursor continues from
+    the last link actually shown.
+    """
+    lines = []
+    length = 0
+    for i, (_, link) in enumerate(links, start):
+        line = f"`{i}.` {link}"
+        if len(line) > 300:
+            line = line[:297] + "..."
+        if length + len(line) + 1 > 1024:
+            break
+        lines.append(line)
+        length += len(line) + 1
+    if len(lines) < len(links):
+        next_cursor = links[len(lines) - 1][0]
+    return "\n".join(lines), len(lines), next_cursor
+
+class SharedLinksView(discord.ui.View):
+    def __init__(self, group, subject, embed, field_index, next_cursor, next_start):
+        super().__init__(timeout=300)
+        self.group = group
+        self.subject = subject
+        self.embed = embed
+        self.field_index = field_index
+        self.pages = [(0, 1)]  # (cursor, first link number) of each page shown so far
+        self.next_cursor = next_cursor
+        self.next_start = next_start
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.previous_page.disabled = len(self.pages) == 1
+        self.next_page.disabled = self.next_cursor is None
+
+    async def show_page(self, interaction):
+        cursor, start = self.pages[-1]
+        links, next_cursor = link_store.page(self.group, self.subject, after=cursor)
+        text, shown, self.next_cursor = format_shared_links(links, next_cursor, start)
+        self.next_start = start + shown
+        self.embed.set_field_at(
+            self.field_index,
+            name="✨ User Shared Links",
+            value=text or "No more links.",
+            inline=False
+        )
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.embed, view=self)
+
+    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if len(self.pages) > 1:
+            self.pages.pop()
+        await self.show_page(interaction)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.next_cursor is not None:
+            self.pages.append((self.next_cursor, self.next_start))
+        await self.show_page(interaction)
+
+def add_shared_links(embed, group, subject):
+    """Add the first page of shared links to embed; returns a pager view if there are more."""
+    links, next_cursor = link_store.page(group, subject)
+    if not links:
+        return discord.utils.MISSING
+    text, shown, next_cursor = format_shared_links(links, next_cursor)
+    embed.add_field(
+        name="✨ User Shared Links",
+        value=text,
+        inline=False
+    )
+    if next_cursor is None:
+        return discord.utils.MISSING
+    return SharedLinksView(group, subject, embed, len(embed.fields) - 1, next_cursor, 1 + shown)
+
 # -------------------- /fetchpastpapers --------------------
+def subject_choices(kind, board, current):
+    return [app_commands.Choice(name=subject.name[:100], value=subject.key)
+            for subject in catalog.complete(kind, board, current)]
+
 @tree.command(name="fetchpastpapers", description="Get a Drive folder for CIE past papers by subject")
 @app_commands.describe(
     board="Choose the board (only CIE supported)",
-    subject="Choose the subject"
+    subject="Start typing a subject, e.g. maths or chemistry"
 )
 @app_commands.choices(
-    board=[app_commands.Choice(name="CIE", value="CIE")],
-    subject=[app_commands.Choice(name=s.title(), value=s) for s in PAST_PAPER_SUBJECTS]
+    board=[app_commands.Choice(name=b, value=b) for b in PAST_PAPER_BOARD_NAMES]
 )
-async def fetchpastpapers(interaction: discord.Interaction, board: app_commands.Choice[str], subject: app_commands.Choice[str]):
+async def fetchpastpapers(interaction: discord.Interaction, board: app_commands.Choice[str], subject: str):
     board_key = board.value
-    subject_key = subject.value
-    folder_link = PAST_PAPER_BOARDS.get(board_key, {}).get(subject_key)
-    shared_links = user_shared_links.get((board_key, subject_key), [])
+    entry = catalog.resolve(PAST_PAPERS, board_key, subject)
+    subject_key = entry.key if entry else subject.lower()
+    folder_link = catalog.folder_url(PAST_PAPERS, board_key, subject_key)
 
     bot_avatar = interaction.client.user.avatar.url if interaction.client.user.avatar else discord.Embed.Empty
 
@@ -124,21 +213,21 @@ async def fetchpastpapers(interaction: discord.Interaction, board: app_commands.
         value=f"[Official Drive Folder]({folder_link})",
         inline=False
     )
-    if shared_links:
-        embed.add_field(
-            name="✨ User Shared Links",
-            value="\n".join([f"`{i+1}.` {link}" for i, link in enumerate(shared_links)]),
-            inline=False
-        )
+    view = add_shared_links(embed, board_key, subject_key)
     embed.set_footer(text="Powered by xcho_", icon_url=bot_avatar)
-    await interaction.response.send_message(embed=embed, ephemeral=False)
+    await interaction.response.send_message(embed=embed, view=view, ephemeral=False)
+
+@fetchpastpapers.autocomplete("subject")
+async def fetchpastpapers_subject_autocomplete(interaction: discord.Interaction, current: str):
+    board = interaction.namespace.board or "CIE"
+    return subject_choices(PAST_PAPERS, board, current)
 
 # -------------------- /fetchnotes --------------------
 class CBSEYearGroupSelect(discord.ui.Select):
     def __init__(self, callback):
         options = [
-            discord.SelectOption(label="Class 10", value="Class 10"),
-            discord.SelectOption(label="Class 9", value="Class 9"),
+            discord.SelectOption(label=group.name, value=group.key)
+            for group in catalog.subjects_for(NOTES, "CBSE")[:25]
         ]
         super().__init__(placeholder="Choose CBSE Year Group", min_values=1, max_values=1, options=options)
         self.callback_fn = callback
@@ -154,27 +243,28 @@ class CBSEYearGroupView(discord.ui.View):
 @tree.command(name="fetchnotes", description="Get Drive folder for notes by board and subject/year group")
 @app_commands.describe(
     board="Choose the board (IGCSE or CBSE)",
-    subject="Choose subject (for IGCSE) or leave blank for CBSE"
+    subject="Start typing a subject (IGCSE) or year group (CBSE, optional)"
 )
 @app_commands.choices(
-    board=[app_commands.Choice(name=b, value=b) for b in NOTES_BOARDS],
-    subject=[app_commands.Choice(name=s.title(), value=s) for s in NOTES_IGCSE_SUBJECT_LIST]
+    board=[app_commands.Choice(name=b, value=b) for b in NOTES_BOARDS]
 )
 async def fetchnotes(
     interaction: discord.Interaction,
     board: app_commands.Choice[str],
-    subject: app_commands.Choice[str] = None
+    subject: str = None
 ):
     board_key = board.value
     bot_avatar = interaction.client.user.avatar.url if interaction.client.user.avatar else discord.Embed.Empty
+    entry = catalog.resolve(NOTES, board_key, subject) if subject else None
 
-    if board_key == "IGCSE":
+    if board_key == "CBSE" and entry:
+        await cbse_year_selected(interaction, entry.key)
+    elif board_key == "IGCSE":
         if not subject:
             await interaction.response.send_message("Please select a subject for IGCSE.", ephemeral=True)
             return
-        subject_key = subject.value
-        folder_link = NOTES_IGCSE_SUBJECTS.get(subject_key)
-        shared_links = user_shared_links.get((board_key, subject_key), [])
+        subject_key = entry.key if entry else subject.lower()
+        folder_link = catalog.folder_url(NOTES, board_key, subject_key)
         if not folder_link:
             await interaction.response.send_message("❌ No Drive folder found for this subject.", ephemeral=True)
             return
@@ -190,41 +280,42 @@ async def fetchnotes(
             value=f"[Official Drive Folder]({folder_link})",
             inline=False
         )
-        if shared_links:
-            embed.add_field(
-                name="✨ User Shared Links",
-                value="\n".join([f"`{i+1}.` {link}" for i, link in enumerate(shared_links)]),
-                inline=False
-            )
+        view = add_shared_links(embed, board_key, subject_key)
         embed.set_footer(text="Powered by xcho_", icon_url=bot_avatar)
-        await interaction.response.send_message(embed=embed, ephemeral=False)
+        await interaction.response.send_message(embed=embed, view=view, ephemeral=False)
 
     elif board_key == "CBSE":
-        async def cbse_year_selected_callback(new_interaction, year_group):
-            bot_avatar = new_interaction.client.user.avatar.url if new_interaction.client.user.avatar else discord.Embed.Empty
-            folder_link = NOTES_CBSE_YEAR_GROUPS.get(year_group)
-            if not folder_link:
-                await new_interaction.response.send_message("❌ No Drive folder found for this year group.", ephemeral=True)
-                return
-            embed = discord.Embed(
-                title=f"📚 CBSE {year_group} Notes",
-                description=f"**Year Group:** `{year_group}`\n\n"
-                            f"**Official Drive Folder:**\n[📁 Click here to open folder]({folder_link})",
-                color=EMBED_COLOR
-            )
-            embed.set_author(name="AjiroTech Notes Assistant", icon_url=bot_avatar)
-            embed.add_field(
-                name="🔗 Useful Links",
-                value=f"[Official Drive Folder]({folder_link})",
-                inline=False
-            )
-            embed.set_footer(text="Powered by xcho_", icon_url=bot_avatar)
-            await new_interaction.response.send_message(embed=embed, ephemeral=False)
-        view = CBSEYearGroupView(cbse_year_selected_callback)
+        view = CBSEYearGroupView(cbse_year_selected)
         await interaction.response.send_message("Please select your CBSE year group:", view=view, ephemeral=True)
     else:
         await interaction.response.send_message("❌ Board not recognized.", ephemeral=True)
 
+async def cbse_year_selected(interaction, year_group_key):
+    bot_avatar = interaction.client.user.avatar.url if interaction.client.user.avatar else discord.Embed.Empty
+    folder_link = catalog.folder_url(NOTES, "CBSE", year_group_key)
+    if not folder_link:
+        await interaction.response.send_message("❌ No Drive folder found for this year group.", ephemeral=True)
+        return
+    year_group = catalog.subjects[year_group_key].name
+    embed = discord.Embed(
+        title=f"📚 CBSE {year_group} Notes",
+        description=f"**Year Group:** `{year_group}`\n\n"
+                    f"**Official Drive Folder:**\n[📁 Click here to open folder]({folder_link})",
+        color=EMBED_COLOR
+    )
+    embed.set_author(name="AjiroTech Notes Assistant", icon_url=bot_avatar)
+    embed.add_field(
+        name="🔗 Useful Links",
+        value=f"[Official Drive Folder]({folder_link})",
+        inline=False
+    )
+    embed.set_footer(text="Powered by xcho_", icon_url=bot_avatar)
+    await interaction.response.send_message(embed=embed, ephemeral=False)
+
+@fetchnotes.autocomplete("subject")
+async def fetchnotes_subject_autocomplete(interaction: discord.Interaction, current: str):
+    return subject_choices(NOTES, interaction.namespace.board or "IGCSE", current)
+
 # -------------------- /addnotes --------------------
 
 class AddNoteModal(discord.ui.Modal, title="Add a Note or Drive Link"):
@@ -250,12 +341,19 @@ class AddNoteModal(discord.ui.Modal, title="Add a Note or Drive Link"):
     async def on_submit(self, interaction: discord.Interaction):
         group = self.children[0].value.strip().upper()
         subject = self.children[1].value.strip().title()
+        subject_key = catalog.canonical(subject) or subject.lower()
         note_link = self.children[2].value.strip()
         user = interaction.user
         bot_avatar = interaction.client.user.avatar.url if interaction.client.user.avatar else discord.Embed.Empty
 
-        # Save for lookup if needed
-        user_shared_links[(group, subject.lower())].append(note_link)
+        # Save for lookup if needed; repeats of an already shared link are dropped
+        _, created = link_store.add(group, subject_key, note_link, user.id)
+        if not created:
+            await interaction.response.send_message(
+                "ℹ️ That link has already been shared for this subject. Thank you!",
+                ephemeral=True
+            )
+            return
 
         # Compose message for the channel
         embed = discord.Embed(
@@ -292,11 +390,318 @@ class AddNoteModal(discord.ui.Modal, title="Add a Note or Drive Link"):
 async def addnotes(interaction: discord.Interaction):
     await interaction.response.send_modal(AddNoteModal())
 
+# -------------------- /searchpapers --------------------
+@tree.command(name="searchpapers", description="Search CIE past-paper questions by topic")
+@app_commands.describe(
+    query="Topic to look for, e.g. moles or vectors",
+    subject="Limit the search to one subject"
+)
+async def searchpapers(interaction: discord.Interaction, query: str, subject: str = None):
+    entry = catalog.resolve(PAST_PAPERS, "CIE", subject) if subject else None
+    if subject and not entry:
+        await interaction.response.send_message(f"❌ Unknown subject `{subject}`.", ephemeral=True)
+        return
+    subject_key = entry.key if entry else None
+    bot_avatar = interaction.client.user.avatar.url if interaction.client.user.avatar else discord.Embed.Empty
+
+    def render(hits):
+        if not hits:
+            return {"content": f"❌ No past-paper questions found for `{query}`."}
+        embed = discord.Embed(
+            title=f"🔎 Past-paper results for \"{query}\"",
+            description=f"**Subject:** `{subject_key.title() if subject_key else 'All subjects'}`",
+            color=EMBED_COLOR
+        )
+        embed.set_author(name="AjiroTech Notes Assistant", icon_url=bot_avatar)
+        for hit in hits:
+            snippet = hit['snippet'] if len(hit['snippet']) <= 300 else hit['snippet'][:297] + "..."
+            embed.add_field(
+                name=f"📄 {hit['paper']} · page {hit['page']}",
+                value=f"{snippet}\n[Open paper](https://drive.google.com/file/d/{hit['file_id']}/view)",
+                inline=False
+            )
+        embed.set_footer(text="Powered by xcho_", icon_url=bot_avatar)
+        return {"embed": embed}
+
+    await run_for_interaction(interaction, get_search_index().search, query, subject_key,
+                              subject=subject_key, timeout=30, render=render)
+
+@searchpapers.autocomplete("subject")
+async def searchpapers_subject_autocomplete(interaction: discord.Interaction, current: str):
+    return subject_choices(PAST_PAPERS, "CIE", current)
+
+@searchpapers.autocomplete("query")
+async def searchpapers_query_autocomplete(interaction: discord.Interaction, current: str):
+    # Discord drops autocomplete replies after 3s, so give up early rather than block the loop
+    try:
+        suggestions = await asyncio.wait_for(
+            asyncio.to_thread(lambda: get_search_index().complete(current)), AUTOCOMPLETE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return []
+    return [app_commands.Choice(name=s[:100], value=s[:100]) for s in suggestions]
+
+# -------------------- /paper --------------------
+def build_paper_embed(subject, year, session, paper, variant, found, bot_avatar):
+    name = catalog.subjects[subject].name
+    code = catalog.subjects[subject].syllabus
+    embed = discord.Embed(
+        title=f"📄 {name} ({code}) · {SESSIONS[session]} {year} · Paper {paper}{found['variant'] or ''}",
+        color=EMBED_COLOR
+    )
+    embed.set_author(name="AjiroTech Notes Assistant", icon_url=bot_avatar)
+    for label, doc in (("📝 Question Paper", 'qp'), ("✅ Mark Scheme", 'ms'), ("📊 Examiner Report", 'er')):
+        file = found[doc]
+        embed.add_field(
+            name=label,
+            value=f"[{file['name']}]({paper_lookup.file_url(file)})" if file else "Not available",
+            inline=False
+        )
+    embed.set_footer(text="Powered by xcho_", icon_url=bot_avatar)
+    return embed
+
+@tree.command(name="paper", description="Get direct links to a CIE question paper, mark scheme and examiner report")
+@app_commands.describe(
+    subject="Start typing a subject, e.g. maths or chemistry",
+    year="Exam year, e.g. 2023",
+    session="Exam session",
+    paper="Paper number, e.g. 4",
+    variant="Variant, e.g. 2 (defaults to the first available)"
+)
+@app_commands.choices(
+    session=[app_commands.Choice(name=label, value=code) for code, label in SESSIONS.items()]
+)
+async def paper(
+    interaction: discord.Interaction,
+    subject: str,
+    year: app_commands.Range[int, 2000, 2099],
+    session: app_commands.Choice[str],
+    paper: app_commands.Range[int, 1, 9],
+    variant: app_commands.Range[int, 0, 9] = None
+):
+    entry = catalog.resolve(PAST_PAPERS, paper_lookup.PAPER_BOARD, subject)
+    if not entry or not entry.syllabus:
+        await interaction.response.send_message(f"❌ Unknown subject `{subject}`.", ephemeral=True)
+        return
+    bot_avatar = interaction.client.user.avatar.url if interaction.client.user.avatar else discord.Embed.Empty
+
+    def render(found):
+        if found is None:
+            return {"content": "⏳ The past-paper index is still being built. Please try again in a few minutes."}
+        if not found['qp'] and not found['ms']:
+            return {"content": f"❌ No {entry.name} paper {paper} found for {SESSIONS[session.value]} {year}."}
+        return {"embed": build_paper_embed(entry.key, year, session.value, paper, variant, found, bot_avatar)}
+
+    # Local index lookups only, cached per index generation; the Drive index
+    # itself is refreshed in the background
+    await run_for_interaction(interaction, paper_lookup.find_paper, entry.key, year, session.value, paper, variant,
+                              subject=entry.key, timeout=30, render=render)
+
+@paper.autocomplete("subject")
+async def paper_subject_autocomplete(interaction: discord.Interaction, current: str):
+    return subject_choices(PAST_PAPERS, paper_lookup.PAPER_BOARD, current)
+
+# --------- DAILY QUESTION ---------
+@tree.command(name="dailyquestion", description="Post a daily question in a channel, rotating through subjects")
+@app_commands.guild_only()
+@app_commands.default_permissions(manage_guild=True)
+@app_commands.rename(post_time="time")
+@app_commands.describe(
+    channel="Channel to post in",
+    subjects="Comma-separated subjects, posted in turn, e.g. maths, physics",
+    post_time="Time of day in UTC, HH:MM"
+)
+async def dailyquestion(interaction: discord.Interaction, channel: discord.TextChannel, subjects: str,
+                        post_time: str = "09:00"):
+    keys = []
+    for name in filter(None, (s.strip() for s in subjects.split(","))):
+        key = catalog.canonical(name)
+        if key not in DAILY_SUBJECTS:
+            available = ", ".join(catalog.subjects[k].name for k in DAILY_SUBJECTS)
+            await interaction.response.send_message(
+                f"❌ No daily questions for '{name}'. Available: {available}.", ephemeral=True)
+            return
+        if key not in keys:
+            keys.append(key)
+    if not keys:
+        await interaction.response.send_message("❌ Give at least one subject.", ephemeral=True)
+        return
+    try:
+        schedule = daily_scheduler.store.set(interaction.guild_id, channel.id, keys, post_time)
+    except ValueError:
+        await interaction.response.send_message("❌ Time must be HH:MM, e.g. 09:00.", ephemeral=True)
+        return
+    slot, _ = pending_slot(schedule, discord.utils.utcnow())
+    first = int(slot_start(slot, parse_time(schedule['post_time'])).timestamp())
+    names = ", ".join(catalog.subjects[k].name for k in keys)
+    await interaction.response.send_message(
+        f"✅ Daily questions ({names}) will be posted in {channel.mention} every day at "
+        f"{schedule['post_time']} UTC, starting <t:{first}:F>.", ephemeral=True)
+
+@dailyquestion.autocomplete("subjects")
+async def dailyquestion_subjects_autocomplete(interaction: discord.Interaction, current: str):
+    # Completes the last entry of the comma-separated list
+    done, _, last = current.rpartition(",")
+    prefix = f"{done}, " if done else ""
+    choices = [s for s in catalog.complete(PAST_PAPERS, "CIE", last) if s.key in DAILY_SUBJECTS]
+    return [app_commands.Choice(name=(prefix + s.name)[:100], value=(prefix + s.key)[:100]) for s in choices]
+
+@tree.command(name="stopdailyquestion", description="Stop posting daily questions in this server")
+@app_commands.guild_only()
+@app_commands.default_permissions(manage_guild=True)
+async def stopdailyquestion(interaction: discord.Interaction):
+    if daily_scheduler.store.remove(interaction.guild_id):
+        await interaction.response.send_message("✅ Daily questions stopped.", ephemeral=True)
+    else:
+        await interaction.response.send_message("ℹ️ No daily question schedule is set up here.", ephemeral=True)
+
+@tree.command(name="markanswer", description="Get your answer to today's daily question marked")
+@app_commands.guild_only()
+@app_commands.describe(answer="Your answer to the latest daily question in this server")
+async def markanswer(interaction: discord.Interaction, answer: app_commands.Range[str, 1, 1500]):
+    key = daily_scheduler.store.answer_key(interaction.guild_id)
+    if not key:
+        await interaction.response.send_message(
+            "ℹ️ There is no daily question with a mark scheme to mark against here yet.", ephemeral=True)
+        return
+    await interaction.response.defer(thinking=True, ephemeral=True)
+    # Imported on first use; see marking_ai.get_openai
+    from marking_service import get_marking_service
+    try:
+        result = await get_marking_service().mark(
+            interaction.user.id, key['question_text'], answer, key['mark_scheme'])
+    except Exception:
+        ERRORS.inc(component="marking")
+        logger.exception("marking_failed guild=%s user=%s", interaction.guild_id, interaction.user.id)
+        await interaction.followup.send("❌ Could not mark that answer right now. Please try again later.",
+                                        ephemeral=True)
+        return
+    await interaction.followup.send(f"📝 {result}"[:2000], ephemeral=True)
+
+def segment_papers():
+    # Imported in the job so PyMuPDF loads off the event loop
+    from question_segments import update_subjects
+    return update_subjects()
+
+@tasks.loop(minutes=paper_lookup.PAPER_INDEX_REFRESH_MINUTES)
+async def refresh_paper_index():
+    try:
+        subjects = await get_maintenance_runner().run(paper_lookup.refresh, timeout=3600)
+        logger.info("paper_index_refreshed subjects=%d", subjects)
+    except Exception:
+        ERRORS.inc(component="paper_index")
+        logger.exception("paper_index_refresh_failed")
+        return
+    # Only papers that are new or changed since the last pass are segmented
+    try:
+        segmented = await get_maintenance_runner().run(segment_papers, timeout=6 * 3600)
+        logger.info("question_segments_refreshed papers=%d", segmented)
+    except Exception:
+        ERRORS.inc(component="segments")
+        logger.exception("question_segments_refresh_failed")
+
+@tasks.loop(hours=SEARCH_REFRESH_HOURS)
+async def refresh_search_index():
+    # Only new or changed papers are downloaded and re-extracted
+    try:
+        indexed = await get_maintenance_runner().run(update_folders, SEARCH_FOLDERS, timeout=6 * 3600)
+        logger.info("search_index_refreshed papers=%d", indexed)
+    except Exception:
+        ERRORS.inc(component="search_index")
+        logger.exception("search_index_refresh_failed")
+
+# --------- METRICS ---------
+@metrics.register_collector
+def collect_runtime_metrics():
+    # Only report on stacks that are already loaded; a scrape must not import them
+    pdf_cache = sys.modules.get("pdf_cache")
+    render = sys.modules.get("render")
+    marking_service = sys.modules.get("marking_service")
+    drive_access = sys.modules.get("drive_access")
+    drive_client = sys.modules.get("drive_client")
+    question_pool = sys.modules.get("question_pool")
+
+    ratios = []
+    if pdf_cache and pdf_cache._cache is not None:
+        ratios.append(({'cache': 'pdf'}, pdf_cache._cache.stats()['hit_ratio']))
+    if render:
+        ratios.append(({'cache': 'render'}, render.render_cache.stats()['hit_ratio']))
+    if marking_service and marking_service._service is not None:
+        stats = marking_service._service.metrics()
+        ratios.append(({'cache': 'marking'}, stats['cache_hits'] / stats['requests'] if stats['requests'] else 0.0))
+    families = [
+        ("igcse_gateway_latency_seconds", "gauge", "Discord gateway heartbeat latency",
+         [({}, bot.latency if bot.latency == bot.latency else 0.0)]),  # NaN before the first heartbeat
+        ("igcse_cache_hit_ratio", "gauge", "Hit ratio of each cache", ratios),
+    ]
+    if drive_access and drive_access._access is not None:
+        stats = drive_access._access.stats()
+        families.append(("igcse_drive_coalesced_total", "counter",
+                         "Drive requests served by an identical in-flight call", [({}, stats['coalesced'])]))
+        families.append(("igcse_drive_retries_total", "counter",
+                         "Drive requests retried after a transient failure", [({}, stats['retries'])]))
+    if drive_client and drive_client._provider is not None:
+        timings = drive_client._provider.timings()
+        families.append(("igcse_drive_request_seconds_total", "counter", "Time spent in Drive HTTP requests",
+                         [({'operation': op}, t['total_seconds']) for op, t in timings.items()]))
+        families.append(("igcse_drive_requests_total", "counter", "Drive HTTP requests",
+                         [({'operation': op}, t['calls']) for op, t in timings.items()]))
+    if question_pool and question_pool._pool is not None:
+        pool_metrics = question_pool._pool.metrics().items()
+        families.append(("igcse_question_pool_depth", "gauge", "Prepared questions waiting per subject",
+                         [({'subject': s}, m['depth']) for s, m in pool_metrics]))
+        families.append(("igcse_question_pool_refill_seconds", "gauge", "Average time to prepare one pooled question",
+                         [({'subject': s}, m['avg_refill_seconds']) for s, m in pool_metrics]))
+    return families
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    COMMAND_SECONDS.observe(elapsed, command=command.qualified_name)
+    logger.info("command_completed command=%s user=%s seconds=%.3f",
+                command.qualified_name, interaction.user.id, elapsed)
+
+@tree.error
+async def on_app_command_error(interaction: discord.Interaction, error):
+    name = interaction.command.qualified_name if interaction.command else "unknown"
+    ERRORS.inc(component=f"command:{name}")
+    logger.error("command_failed command=%s user=%s", name, interaction.user.id, exc_info=error)
+    message = "❌ Something went wrong running that command."
+    if interaction.response.is_done():
+        await interaction.followup.send(message, ephemeral=True)
+    else:
+        await interaction.response.send_message(message, ephemeral=True)
+
+_loop_watcher = None
+
 # --------- SYNC COMMANDS ON READY ---------
 @bot.event
 async def on_ready():
-    await tree.sync()
-    print(f"Logged in as {bot.user}")
+    global _loop_watcher
+    # on_ready fires again after every gateway reconnect
+    first_ready = not startup.reported
+    if first_ready:
+        startup.mark("connect")
+    # Background work starts first so a failed command sync cannot hold it back
+    if not refresh_paper_index.is_running():
+        refresh_paper_index.start()
+    if not refresh_search_index.is_running():
+        refresh_search_index.start()
+    daily_scheduler.start()
+    if _loop_watcher is None:
+        _loop_watcher = asyncio.create_task(metrics.watch_event_loop())
+    if first_ready:
+        startup.mark("background_tasks")
+    # Global syncs are rate limited, so only push the tree when it has changed
+    try:
+        await sync_if_changed(tree, bot.application_id)
+    except Exception:
+        # The fingerprint is only saved on success, so the next ready retries
+        ERRORS.inc(component="command_sync")
+        logger.exception("command_sync_failed")
+    logger.info("logged_in user=%s guilds=%d", bot.user, len(bot.guilds))
+    if first_ready:
+        startup.mark("command_sync")
+        startup.report()
 
 # --------- RUN THE BOT ----------
 if __name__ == "__main__":
@@ -304,6 +709,7 @@ if __name__ == "__main__":
     flask_thread = Thread(target=run_flask)
     flask_thread.daemon = True
     flask_thread.start()
+    startup.mark("setup")
 
     # Start Discord bot (blocking)
     bot.run(TOKEN)
@@ -0,0 +1,181 @@
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+
+CATALOG_PATH = os.getenv(
+    "SUBJECT_CATALOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "subjects.json"))
+# Discord shows at most 25 autocomplete choices
+MAX_SUGGESTIONS = 25
+# Prefixes longer than this fall back to the trigram index
+MAX_PREFIX = 16
+MIN_TRIGRAM_SCORE = 0.3
+
+PAST_PAPERS = "past_papers"
+NOTES = "notes"
+
+
+def normalize(text):
+    return re.sub(r'[^a-z0-9]+', ' ', (text or '').lower()).strip()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class Subject:
+    key: str
+    name: str
+    syllabus: str = None
+    aliases: tuple = ()
+    theory_papers: tuple = ()
+
+    @property
+    def terms(self):
+        return (self.key, self.name) + self.aliases
+
+
+class SubjectIndex:
+    """Precomputed prefix and trigram lookups over a fixed list of subjects.
+
+    Every key, name, alias and word within them is expanded into its
+    prefixes up front, so typing-as-you-go lookups are one dict access.
+    Misspellings fall through to trigram similarity.
+    """
+
+    def __init__(self, subjects):
+        self.subjects = sorted(subjects, key=lambda s: s.name)
+        self._prefixes = defaultdict(list)
+        self._trigrams = defaultdict(set)
+        self._sizes = []
+        for i, subject in enumerate(self.subjects):
+            grams = set()
+            for term in map(normalize, subject.terms):
+                starts = [0] + [m.end() for m in re.finditer(r' ', term)]
+                for start in starts:
+                    for end in range(start + 1, min(len(term), start + MAX_PREFIX) + 1):
+                        bucket = self._prefixes[term[start:end]]
+                        if not bucket or bucket[-1] != i:
+                            bucket.append(i)
+                grams |= trigrams(term)
+            for gram in grams:
+                self._trigrams[gram].add(i)
+            self._sizes.append(len(grams))
+
+    def complete(self, text, limit=MAX_SUGGESTIONS):
+        query = normalize(text)
+        if not query:
+            return self.subjects[:limit]
+        hits = list(self._prefixes.get(query[:MAX_PREFIX], ()))
+        if len(query) > MAX_PREFIX:
+            hits = [i for i in hits if any(query in normalize(t) for t in self.subjects[i].terms)]
+        words = query.split()
+        if not hits and len(words) > 1:
+            # "comp sci": every word is a prefix of some word of the subject
+            common = set.intersection(*(set(self._prefixes.get(w[:MAX_PREFIX], ())) for w in words))
+            hits = sorted(common)
+        if len(hits) < limit:
+            seen = set(hits)
+            grams = trigrams(query)
+            scores = defaultdict(int)
+            for gram in grams:
+                for i in self._trigrams.get(gram, ()):
+                    scores[i] += 1
+            ranked = sorted(
+                ((shared / (len(grams) + self._sizes[i] - shared), i) for i, shared in scores.items()
+                 if i not in seen),
+                reverse=True)
+            hits.extend(i for score, i in ranked if score >= MIN_TRIGRAM_SCORE)
+        return [self.subjects[i] for i in hits[:limit]]
+
+
+class Catalog:
+    """Subjects, their aliases and the Drive folders for each board.
+
+    ``subjects.json`` holds one entry per subject plus, for past papers and
+    notes, a map of board -> subject key -> Drive folder id.
+    """
+
+    def __init__(self, config):
+        self.subjects = {}
+        self._aliases = {}
+        for key, entry in config.get("subjects", {}).items():
+            subject = Subject(
+                key=key,
+                name=entry.get("name", key.title()),
+                syllabus=entry.get("syllabus"),
+                aliases=tuple(entry.get("aliases", ())),
+                theory_papers=tuple(entry.get("theory_papers", ())),
+            )
+            self.subjects[key] = subject
+            for term in subject.terms:
+                self._aliases.setdefault(normalize(term), key)
+        self.folders = {kind: config.get(kind, {}) for kind in (PAST_PAPERS, NOTES)}
+        self._indexes = {
+            (kind, board): SubjectIndex([self.subjects[k] for k in folders if k in self.subjects])
+            for kind, boards in self.folders.items() for board, folders in boards.items()
+        }
+
+    def canonical(self, text):
+        """The subject key for a key, name or alias, or None."""
+        return self._aliases.get(normalize(text))
+
+    def boards(self, kind):
+        return list(self.folders.get(kind, {}))
+
+    def subjects_for(self, kind, board):
+        index = self._indexes.get((kind, board))
+        return index.subjects if index else []
+
+    def folder_id(self, kind, board, subject):
+        key = self.canonical(subject)
+        return self.folders.get(kind, {}).get(board, {}).get(key) if key else None
+
+    def folder_url(self, kind, board, subject):
+        folder_id = self.folder_id(kind, board, subject)
+        return f"https://drive.google.com/drive/folders/{folder_id}" if folder_id else None
+
+    def complete(self, kind, board, text, limit=MAX_SUGGESTIONS):
+        if board is None:
+            subjects = {s.key: s for (k, _), index in self._indexes.items() if k == kind
+                        for s in index.complete(text, limit)}
+            return list(subjects.values())[:limit]
+        index = self._indexes.get((kind, board))
+        return index.complete(text, limit) if index else []
+
+    def resolve(self, kind, board, text):
+        """Best subject on ``board`` for free text: exact alias first, then the top suggestion."""
+        key = self.canonical(text)
+        if key and self.folder_id(kind, board, key):
+            return self.subjects[key]
+        suggestions = self.complete(kind, board, text, limit=1) if normalize(text) else []
+        return suggestions[0] if suggestions else None
+
+    def legacy_names(self):
+        """Lower-cased aliases and names that differ from their subject key, mapped to the key."""
+        return {term.lower(): subject.key for subject in self.subjects.values()
+                for term in subject.terms if term.lower() != subject.key}
+
+    def theory_papers(self, kind=PAST_PAPERS, board="CIE"):
+        return {s.key: set(s.theory_papers) for s in self.subjects_for(kind, board) if s.theory_papers}
+
+
+def load_catalog(path=CATALOG_PATH):
+    with open(path, encoding="utf-8") as f:
+        return Catalog(json.load(f))
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = load_catalog()
+        return _catalog
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+COMMAND_SYNC_STATE = os.getenv("COMMAND_SYNC_STATE", "command_sync.json")
+# Set to 1 to push the tree even when the fingerprint matches
+FORCE_COMMAND_SYNC = os.getenv("FORCE_COMMAND_SYNC", "0") == "1"
+
+
+def tree_fingerprint(tree, guild=None):
+    """Stable hash of the app commands as they would be sent to Discord."""
+    payload = []
+    for command in tree.get_commands(guild=guild):
+        try:
+            payload.append(command.to_dict(tree))
+        except TypeError:
+            # discord.py before 2.4 takes no tree argument
+            payload.append(command.to_dict())
+    payload.sort(key=lambda c: (c.get('type', 1), c['name']))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _load_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def sync_if_changed(tree, application_id, path=COMMAND_SYNC_STATE, force=FORCE_COMMAND_SYNC):
+    """Sync the global command tree only when it differs from the last successful sync.
+
+    Fingerprints are stored per application id, so several bots can share a
+    state file. Returns True if a sync was sent.
+    """
+    key = str(application_id)
+    fingerprint = tree_fingerprint(tree)
+    state = _load_state(path)
+    if not force and state.get(key) == fingerprint:
+        logger.info("command_sync_skipped fingerprint=%s", fingerprint[:12])
+        return False
+    await tree.sync()
+    state[key] = fingerprint
+    _save_state(path, state)
+    logger.info("command_sync_done fingerprint=%s", fingerprint[:12])
+    return True
@@ -0,0 +1,169 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseDownload
+
+# Drive's default per-project quota is 12,000 queries per minute
+DRIVE_QUOTA_PER_MINUTE = float(os.getenv("DRIVE_QUOTA_PER_MINUTE", "12000"))
+DRIVE_QUOTA_BURST = int(os.getenv("DRIVE_QUOTA_BURST", "100"))
+DRIVE_MAX_RETRIES = int(os.getenv("DRIVE_MAX_RETRIES", "6"))
+
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "backendError"}
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            self.sleep(wait)
+
+
+def _error_reason(error):
+    try:
+        return json.loads(error.content)['error']['errors'][0]['reason']
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+def is_retryable(error):
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        if status == 429 or status >= 500:
+            return True
+        return status == 403 and _error_reason(error) in RATE_LIMIT_REASONS
+    return isinstance(error, (socket.timeout, TimeoutError, ConnectionError))
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for retryable Drive errors."""
+
+    def __init__(self, max_retries=DRIVE_MAX_RETRIES, base_delay=1.0, max_delay=32.0,
+                 sleep=time.sleep, retryable=is_retryable):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.retryable = retryable
+        self.retries = 0
+
+    def call(self, fn):
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not self.retryable(e):
+                    raise
+                self.retries += 1
+                self.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+                attempt += 1
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event()}
+            else:
+                self.coalesced += 1
+        if not leader:
+            call['done'].wait()
+            if 'error' in call:
+                raise call['error']
+            return call['result']
+        try:
+            call['result'] = fn()
+            return call['result']
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+class DriveAccess:
+    """Every Drive API call goes through here: quota limiting, retries and coalescing."""
+
+    def __init__(self, limiter=None, retry=None, single_flight=None):
+        self.limiter = limiter or TokenBucket(DRIVE_QUOTA_PER_MINUTE / 60.0, DRIVE_QUOTA_BURST)
+        self.retry = retry or RetryPolicy()
+        self.single_flight = single_flight or SingleFlight()
+
+    def _execute_once(self, request):
+        self.limiter.acquire()
+        return request.execute()
+
+    def execute(self, request):
+        # Identical read requests in flight at the same time share one response
+        method = getattr(request, "method", None)
+        uri = getattr(request, "uri", None)
+        key = (method, uri, getattr(request, "body", None)) if method == "GET" and uri else None
+        run = lambda: self.retry.call(lambda: self._execute_once(request))
+        if key is None:
+            return run()
+        return self.single_flight.do(key, run)
+
+    def download(self, request, fh, chunksize):
+        """Stream a get_media request into ``fh``, retrying failed chunks where they left off."""
+        downloader = MediaIoBaseDownload(fh, request, chunksize=chunksize)
+
+        def next_chunk():
+            self.limiter.acquire()
+            return downloader.next_chunk()
+
+        done = False
+        while not done:
+            # The downloader only advances its offset on success, so a retry
+            # re-requests the same byte range
+            _, done = self.retry.call(next_chunk)
+
+    def stats(self):
+        return {'retries': self.retry.retries, 'coalesced': self.single_flight.coalesced}
+
+
+_access = None
+_access_lock = threading.Lock()
+
+
+def get_drive_access():
+    global _access
+    with _access_lock:
+        if _access is None:
+            _access = DriveAccess()
+        return _access
+
+
+def execute(request):
+    return get_drive_access().execute(request)
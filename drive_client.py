@@ -0,0 +1,124 @@
+import datetime
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import google_auth_httplib2
+import httplib2
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+
+SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
+
+DRIVE_HTTP_TIMEOUT = float(os.getenv("DRIVE_HTTP_TIMEOUT", "60"))
+# Refresh the access token this many seconds before it expires
+TOKEN_REFRESH_MARGIN = int(os.getenv("DRIVE_TOKEN_REFRESH_MARGIN", "300"))
+
+
+def _operation(method, uri):
+    # Collapse file ids so timings group by endpoint, e.g. "GET files/{id} (media)"
+    parts = urlsplit(uri)
+    path = re.sub(r'^/(upload/)?drive/v3/', '', parts.path)
+    path = re.sub(r'(files|changes)/[^/]+', r'\1/{id}', path)
+    if 'alt=media' in parts.query:
+        path += " (media)"
+    return f"{method} {path}"
+
+
+class TimedHttp:
+    """Wraps an authorized httplib2 client, timing every request by endpoint."""
+
+    def __init__(self, http, provider):
+        self._http = http
+        self._provider = provider
+
+    def request(self, uri, method="GET", *args, **kwargs):
+        self._provider.refresh_if_needed()
+        started = time.perf_counter()
+        try:
+            return self._http.request(uri, method, *args, **kwargs)
+        finally:
+            self._provider.record(_operation(method, uri), time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._http, name)
+
+
+class DriveClientProvider:
+    """Hands out Drive services that are cheap to get and safe to use from many threads.
+
+    Credentials are loaded once and refreshed shortly before they expire. The
+    service is built from the bundled (static) discovery document, once per
+    thread, because an httplib2 connection must not be shared across threads.
+    Each thread keeps its keep-alive connection for the life of the process.
+    """
+
+    def __init__(self, credentials_file=None, scopes=SCOPES, timeout=DRIVE_HTTP_TIMEOUT,
+                 refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.credentials_file = credentials_file
+        self.scopes = scopes
+        self.timeout = timeout
+        self.refresh_margin = datetime.timedelta(seconds=refresh_margin)
+        self._credentials = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._timings = {}
+
+    @property
+    def credentials(self):
+        with self._lock:
+            if self._credentials is None:
+                path = self.credentials_file or os.getenv("GOOGLE_DRIVE_CREDENTIALS")
+                self._credentials = service_account.Credentials.from_service_account_file(
+                    path, scopes=self.scopes)
+            return self._credentials
+
+    def refresh_if_needed(self):
+        creds = self.credentials
+        expiry = creds.expiry
+        if creds.token and expiry and expiry - datetime.datetime.utcnow() > self.refresh_margin:
+            return
+        with self._lock:
+            # Another thread may have refreshed while we waited
+            expiry = creds.expiry
+            if creds.token and expiry and expiry - datetime.datetime.utcnow() > self.refresh_margin:
+                return
+            creds.refresh(google_auth_httplib2.Request(httplib2.Http(timeout=self.timeout)))
+
+    def service(self):
+        service = getattr(self._local, "service", None)
+        if service is None:
+            http = google_auth_httplib2.AuthorizedHttp(
+                self.credentials, http=httplib2.Http(timeout=self.timeout))
+            service = build('drive', 'v3', http=TimedHttp(http, self),
+                            static_discovery=True, cache_discovery=False)
+            self._local.service = service
+        return service
+
+    def record(self, operation, seconds):
+        with self._lock:
+            stats = self._timings.get(operation)
+            if stats is None:
+                stats = self._timings[operation] = {'calls': 0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+            stats['calls'] += 1
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+    def timings(self):
+        with self._lock:
+            return {op: dict(stats, avg_seconds=stats['total_seconds'] / stats['calls'])
+                    for op, stats in self._timings.items()}
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_drive_provider():
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = DriveClientProvider()
+        return _provider
@@ -0,0 +1,268 @@
+import os
+import sqlite3
+import threading
+import time
+
+from drive_access import execute
+from drive_scanner import DriveScanner
+
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+PDF_MIME = 'application/pdf'
+
+FILE_FIELDS = "id, name, mimeType, parents, md5Checksum, modifiedTime, trashed"
+
+INDEX_PATH = os.getenv("DRIVE_INDEX_PATH", "drive_index.db")
+# Minimum seconds between two pulls of the changes feed
+SYNC_INTERVAL = float(os.getenv("DRIVE_INDEX_SYNC_INTERVAL", "60"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    parent TEXT,
+    md5 TEXT,
+    modified_time TEXT
+);
+CREATE INDEX IF NOT EXISTS files_parent ON files (parent, mime_type);
+CREATE TABLE IF NOT EXISTS roots (
+    folder_id TEXT PRIMARY KEY,
+    scanned_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+SUBTREE_PDFS = """
+WITH RECURSIVE tree(id) AS (
+    SELECT ?
+    UNION
+    SELECT f.id FROM files f JOIN tree t ON f.parent = t.id
+    WHERE f.mime_type = ?
+)
+SELECT id, name, mime_type, parent, md5, modified_time FROM files
+WHERE parent IN tree AND mime_type = ?
+"""
+
+
+def _row_to_file(row):
+    return {
+        'id': row[0],
+        'name': row[1],
+        'mimeType': row[2],
+        'parent': row[3],
+        'md5Checksum': row[4],
+        'modifiedTime': row[5],
+    }
+
+
+class DriveIndex:
+    """Local SQLite mirror of the Drive folders the bot reads from.
+
+    Roots are scanned once, then kept current from the Drive changes feed so
+    lookups are local queries instead of folder walks. Drive calls happen
+    outside the database lock and their results are applied in short write
+    transactions, so lookups never wait on the network.
+    """
+
+    def __init__(self, path=INDEX_PATH, sync_interval=SYNC_INTERVAL, scanner=None):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.scanner = scanner or DriveScanner()
+        self.generation = 0
+        self._last_sync = 0.0
+        self._lock = threading.RLock()
+        # Serializes scans and syncs against each other, not against readers
+        self._write_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ---- state helpers ----
+    def _get_state(self, key):
+        row = self._db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key, value):
+        self._db.execute(
+            "INSERT INTO state (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value))
+
+    def _upsert(self, item, parent):
+        self._db.execute(
+            "INSERT INTO files (id, name, mime_type, parent, md5, modified_time) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET name = excluded.name, mime_type = excluded.mime_type, "
+            "parent = excluded.parent, md5 = excluded.md5, modified_time = excluded.modified_time",
+            (item['id'], item['name'], item['mimeType'], parent,
+             item.get('md5Checksum'), item.get('modifiedTime')))
+
+    def _remove(self, file_id):
+        # Drop the file and, if it was a folder, everything below it
+        self._db.execute("""
+            WITH RECURSIVE tree(id) AS (
+                SELECT ?
+                UNION
+                SELECT f.id FROM files f JOIN tree t ON f.parent = t.id
+            )
+            DELETE FROM files WHERE id IN tree""", (file_id,))
+
+    def _is_known_folder(self, folder_id):
+        if self._db.execute("SELECT 1 FROM roots WHERE folder_id = ?", (folder_id,)).fetchone():
+            return True
+        row = self._db.execute(
+            "SELECT 1 FROM files WHERE id = ? AND mime_type = ?", (folder_id, FOLDER_MIME)).fetchone()
+        return row is not None
+
+    def _store_scan(self, items, root_id):
+        # Items from a scan carry their own parent list; keep the first one that
+        # lies inside the scanned tree.
+        folders = {root_id} | {i['id'] for i in items if i['mimeType'] == FOLDER_MIME}
+        for item in items:
+            if item['mimeType'] not in (PDF_MIME, FOLDER_MIME):
+                continue
+            parents = item.get('parents') or [root_id]
+            parent = next((p for p in parents if p in folders), parents[0])
+            self._upsert(item, parent)
+
+    # ---- indexing ----
+    def add_root(self, service, folder_id):
+        with self._write_lock:
+            # Concurrent first requests for a subject wait here and scan only once
+            if self.has_root(folder_id):
+                return
+            with self._lock:
+                token = self._get_state("page_token")
+            if token is None:
+                # Taken before the scan so changes made during it are not missed
+                token = execute(service.changes().getStartPageToken())['startPageToken']
+            items = self.scanner(service, folder_id)
+            with self._lock:
+                if self._get_state("page_token") is None:
+                    self._set_state("page_token", token)
+                self._store_scan(items, folder_id)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO roots (folder_id, scanned_at) VALUES (?, ?)",
+                    (folder_id, time.time()))
+                self._db.commit()
+                self.generation += 1
+
+    def has_root(self, folder_id):
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM roots WHERE folder_id = ?", (folder_id,)).fetchone()
+            return row is not None
+
+    def sync(self, service):
+        """Apply pending entries from the Drive changes feed. Returns the number applied."""
+        with self._write_lock:
+            with self._lock:
+                page_token = self._get_state("page_token")
+            if page_token is None:
+                return 0
+            changes = []
+            while True:
+                response = execute(service.changes().list(
+                    pageToken=page_token,
+                    spaces='drive',
+                    includeRemoved=True,
+                    fields=f"nextPageToken, newStartPageToken, "
+                           f"changes(fileId, removed, file({FILE_FIELDS}))",
+                ))
+                changes.extend(response.get("changes", []))
+                if response.get("newStartPageToken") or not response.get("nextPageToken"):
+                    page_token = response.get("newStartPageToken") or page_token
+                    break
+                page_token = response["nextPageToken"]
+
+            applied = 0
+            new_folders = []
+            with self._lock:
+                for change in changes:
+                    if self._apply_change(change, new_folders):
+                        applied += 1
+                if not new_folders:
+                    self._set_state("page_token", page_token)
+                self._db.commit()
+                if applied and not new_folders:
+                    self.generation += 1
+
+            if new_folders:
+                # A folder moved into a tracked tree brings its contents with it,
+                # but those files do not show up in the changes feed. The token
+                # is only advanced once they are stored.
+                scans = [(folder_id, self.scanner(service, folder_id)) for folder_id in new_folders]
+                with self._lock:
+                    for folder_id, items in scans:
+                        self._store_scan(items, folder_id)
+                    self._set_state("page_token", page_token)
+                    self._db.commit()
+                    self.generation += 1
+            self._last_sync = time.time()
+            return applied
+
+    def _apply_change(self, change, new_folders):
+        file_id = change['fileId']
+        item = change.get('file')
+        known = self._db.execute("SELECT 1 FROM files WHERE id = ?", (file_id,)).fetchone() is not None
+
+        if change.get('removed') or not item or item.get('trashed'):
+            if known:
+                self._remove(file_id)
+                return True
+            return False
+
+        parent = next((p for p in item.get('parents', []) if self._is_known_folder(p)), None)
+        if parent is None:
+            # Moved out of every tracked tree
+            if known:
+                self._remove(file_id)
+                return True
+            return False
+
+        if item['mimeType'] not in (PDF_MIME, FOLDER_MIME):
+            return False
+        if item['mimeType'] == FOLDER_MIME and not known:
+            new_folders.append(file_id)
+        self._upsert(item, parent)
+        return True
+
+    def ensure_fresh(self, service, folder_id):
+        # Index the root on first use, then pull the changes feed at most once per interval
+        if not self.has_root(folder_id):
+            self.add_root(service, folder_id)
+        elif time.time() - self._last_sync >= self.sync_interval:
+            self.sync(service)
+
+    # ---- queries ----
+    def list_pdfs(self, folder_id):
+        with self._lock:
+            rows = self._db.execute(SUBTREE_PDFS, (folder_id, FOLDER_MIME, PDF_MIME)).fetchall()
+        return [_row_to_file(r) for r in rows]
+
+    def get(self, file_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, name, mime_type, parent, md5, modified_time FROM files WHERE id = ?",
+                (file_id,)).fetchone()
+        return _row_to_file(row) if row else None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index(service_factory=None):
+    # service_factory is only used when the shared index is first created; it
+    # lets the tree scanner give each worker thread its own Drive service.
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DriveIndex(scanner=DriveScanner(service_factory=service_factory))
+        return _index
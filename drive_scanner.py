@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from drive_access import execute
+
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+PDF_MIME = 'application/pdf'
+
+SCAN_FIELDS = "nextPageToken, files(id, name, mimeType, parents, md5Checksum, modifiedTime)"
+
+# Drive rejects very long queries, so parent ids are batched in groups of this size
+PARENTS_PER_QUERY = int(os.getenv("DRIVE_SCAN_PARENTS_PER_QUERY", "25"))
+SCAN_WORKERS = int(os.getenv("DRIVE_SCAN_WORKERS", "8"))
+PAGE_SIZE = 1000
+
+
+@dataclass
+class ScanStats:
+    queries: int = 0
+    api_calls: int = 0
+    pages: int = 0
+    levels: int = 0
+    folders: int = 0
+    files: int = 0
+    elapsed: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record_page(self, first_page):
+        with self._lock:
+            self.api_calls += 1
+            self.pages += 1
+            if first_page:
+                self.queries += 1
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'api_calls': self.api_calls,
+            'pages': self.pages,
+            'levels': self.levels,
+            'folders': self.folders,
+            'files': self.files,
+            'elapsed': round(self.elapsed, 3),
+        }
+
+
+def build_query(parent_ids, mime_types=(PDF_MIME, FOLDER_MIME)):
+    parents = " or ".join(f"'{pid}' in parents" for pid in parent_ids)
+    mimes = " or ".join(f"mimeType = '{m}'" for m in mime_types)
+    return f"({parents}) and ({mimes}) and trashed = false"
+
+
+class DriveScanner:
+    """Breadth-first Drive tree walker.
+
+    Each level of the tree is listed with a handful of batched
+    ``'a' in parents or 'b' in parents`` queries that run concurrently on a
+    bounded pool. Every query is paged to the end.
+
+    The googleapiclient transport is not thread-safe, so concurrent scans need
+    a ``service_factory`` that is called once per worker thread. Without one the
+    scanner falls back to a single worker using the service it was handed.
+    """
+
+    def __init__(self, service_factory=None, max_workers=SCAN_WORKERS,
+                 parents_per_query=PARENTS_PER_QUERY, page_size=PAGE_SIZE):
+        self.service_factory = service_factory
+        self.max_workers = max_workers if service_factory else 1
+        self.parents_per_query = parents_per_query
+        self.page_size = page_size
+        self.last_stats = None
+        self._local = threading.local()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="drive-scan")
+            return self._pool
+
+    def _service(self, fallback):
+        if self.service_factory is None:
+            return fallback
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self._local.service = self.service_factory()
+        return service
+
+    def _list_batch(self, fallback_service, parent_ids, stats):
+        service = self._service(fallback_service)
+        query = build_query(parent_ids)
+        items = []
+        page_token = None
+        first = True
+        while True:
+            response = execute(service.files().list(
+                q=query,
+                fields=SCAN_FIELDS,
+                pageSize=self.page_size,
+                pageToken=page_token,
+            ))
+            stats.record_page(first)
+            first = False
+            items.extend(response.get("files", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return items
+
+    def scan(self, service, folder_id):
+        """Return every PDF and folder below ``folder_id``."""
+        stats = ScanStats()
+        started = time.perf_counter()
+        found = []
+        seen = {folder_id}
+        frontier = [folder_id]
+        pool = self._executor()
+
+        while frontier:
+            stats.levels += 1
+            batches = [frontier[i:i + self.parents_per_query]
+                       for i in range(0, len(frontier), self.parents_per_query)]
+            futures = [pool.submit(self._list_batch, service, batch, stats) for batch in batches]
+            next_frontier = []
+            for future in futures:
+                for item in future.result():
+                    if item['id'] in seen:
+                        continue
+                    seen.add(item['id'])
+                    found.append(item)
+                    if item['mimeType'] == FOLDER_MIME:
+                        stats.folders += 1
+                        next_frontier.append(item['id'])
+                    else:
+                        stats.files += 1
+            frontier = next_frontier
+
+        stats.elapsed = time.perf_counter() - started
+        self.last_stats = stats
+        return found
+
+    __call__ = scan
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
@@ -1,173 +1,221 @@
-import os
-import io
+import logging
 import random
-import fitz  # PyMuPDF
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from pdf2image import convert_from_path
-import os
-import re
-
-SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
-
-# Subject-specific Google Drive folder IDs (add more as needed)
-FOLDER_IDS = {
-    "math": "1GZUs34yS5dMmhO8Pm8rWokkS7VBQ5bqF",
-    "biology": "1tCMnYUtHJ1jQAqmagUw1h5pWrtHxNwYE",
-    "physics": "1Baa4OKIzjjtHzwcy1-xwjBuCDMLh2FlW",
-    "chemistry": "1Ji-VoRovspqnZtvxhJW1CCdeMilxQBCX"
-}
-
-# Define theory paper patterns per subject
-THEORY_PAPER_RULES = {
-    "math": ["_qp_2", "_qp_4"],
-    "biology": ["_qp_2", "_qp_4"],
-    "physics": ["_qp_2", "_qp_4"],
-    "chemistry": ["_qp_2", "_qp_4"]
-}
-def filter_theory_papers(files, subject):
-    allowed = THEORY_PAPER_RULES.get(subject, [])
-    return [f for f in files if any(rule in f['name'].lower() for rule in allowed)]
+import time
+from dataclasses import dataclass, field
+from catalog import PAST_PAPERS, get_catalog
+from drive_client import get_drive_provider
+from drive_index import get_index
+from metrics import stage
+from mark_schemes import load_mark_scheme, slice_for_question
+from paper_codes import PaperIndex, parse_paper_name
+from pdf_cache import get_pdf_cache
+from question_segments import first_question_page, get_segment_index
+from render import RENDER_DPI, as_file_buffer, render_region, render_spans
 
+logger = logging.getLogger(__name__)
 
-def get_drive_service():
-    creds = service_account.Credentials.from_service_account_file(
-        os.getenv("GOOGLE_DRIVE_CREDENTIALS"), scopes=SCOPES)
-    return build('drive', 'v3', credentials=creds)
+# Paper numbers that count as theory papers per subject; only these subjects
+# get random theory questions. Both come from subjects.json.
+THEORY_PAPERS = get_catalog().theory_papers(PAST_PAPERS, "CIE")
+FOLDER_IDS = {subject: get_catalog().folder_id(PAST_PAPERS, "CIE", subject) for subject in THEORY_PAPERS}
 
-def list_pdfs_in_folder(service, folder_id):
-    pdfs = []
+# Parsed paper indexes per subject, rebuilt only when the Drive index changes
+_paper_indexes = {}
 
-    def recursive_scan(current_folder_id):
-        query = f"'{current_folder_id}' in parents"
-        items = service.files().list(q=query, fields="files(id, name, mimeType)").execute().get("files", [])
-        for item in items:
-            if item['mimeType'] == 'application/pdf':
-                pdfs.append(item)
-            elif item['mimeType'] == 'application/vnd.google-apps.folder':
-                recursive_scan(item['id'])
 
-    recursive_scan(folder_id)
-    return pdfs
+def subject_key(subject):
+    # Accepts aliases such as "math" or "Maths"
+    return get_catalog().canonical(subject) or subject.lower()
 
-def filter_theory_papers(files, subject):
-    allowed = THEORY_PAPER_RULES.get(subject, [])
-    return [f for f in files if any(paper in f['name'].lower() for paper in allowed)]
+def get_drive_service():
+    # Built once per thread and reused; see drive_client.DriveClientProvider
+    return get_drive_provider().service()
 
-def download_random_pdf(service, folder_id, subject):
-    all_files = list_pdfs_in_folder(service, folder_id)
+def list_pdfs_in_folder(service, folder_id):
+    # Served from the local Drive index; the folder tree is only walked the
+    # first time a root is seen, after that the changes feed keeps it current.
+    index = get_index(service_factory=get_drive_service)
+    with stage("drive_list", folder=folder_id):
+        index.ensure_fresh(service, folder_id)
+        return index.list_pdfs(folder_id)
+
+def local_paper_index(subject, folder_id=None):
+    # Built from the local Drive index only, never calling Drive; None until
+    # the subject's folder has been indexed
+    folder_id = folder_id or get_catalog().folder_id(PAST_PAPERS, "CIE", subject)
+    index = get_index(service_factory=get_drive_service)
+    if not folder_id or not index.has_root(folder_id):
+        return None
+    generation = index.generation
+    cached = _paper_indexes.get(subject)
+    if cached and cached[0] == generation:
+        return cached[1]
+    paper_index = PaperIndex(THEORY_PAPERS).add_all(subject, index.list_pdfs(folder_id))
+    _paper_indexes[subject] = (generation, paper_index)
+    return paper_index
+
+def get_paper_index(service, subject):
+    folder_id = FOLDER_IDS.get(subject)
+    if not folder_id:
+        return None
+    index = get_index(service_factory=get_drive_service)
+    with stage("drive_list", folder=folder_id):
+        index.ensure_fresh(service, folder_id)
+    return local_paper_index(subject, folder_id)
+
+def pick_theory_paper(service, subject, exclude=()):
+    # ``exclude`` holds file ids to avoid; ignored once every paper has been used
+    paper_index = get_paper_index(service, subject)
+    theory = paper_index.theory_for(subject) if paper_index else []
+    if not theory:
+        return None
+    fresh = [r for r in theory if r.file['id'] not in exclude]
+    return random.choice(fresh or theory).file
 
-    filtered = filter_theory_papers(all_files, subject)
-    if not filtered:
+def download_random_pdf(service, folder_id, subject):
+    # Pick a random theory file. The path is not pinned, so open it straight
+    # away or use get_pdf_cache().pinned instead.
+    chosen = pick_theory_paper(service, subject)
+    if not chosen:
         return None, None
+    path = get_pdf_cache().fetch(service, chosen)
+    return path, chosen['name']
+
+def render_key(file):
+    # Renders are cached per file revision, so an edited paper is drawn again
+    return (file['id'], file.get('md5Checksum'))
+
+def extract_question_image_and_text(pdf_path, page=0, clip=None, dpi=RENDER_DPI, cache_key=None):
+    # Returns an in-memory image buffer that can be passed straight to discord.File
+    image_bytes, text = render_region(pdf_path, page=page, clip=clip, dpi=dpi, cache_key=cache_key)
+    return as_file_buffer(image_bytes), text
+
+def render_question(service, subject, exclude=()):
+    """Render one question of ``subject`` as ``(file, question_number, image_bytes, text)``.
+
+    Prefers a single segmented question; subjects that have not been
+    segmented yet fall back to the first question page of a random paper,
+    with no question number. ``exclude`` holds ``(file_id, number)`` pairs,
+    number 0 meaning a whole paper. Returns None if there is nothing to render.
+    """
+    segment = get_segment_index().random_question(subject, exclude=exclude)
+    chosen = get_index().get(segment['file_id']) if segment else None
+    if chosen:
+        with get_pdf_cache().pinned(service, chosen) as pdf_path:
+            image_bytes, text = render_spans(pdf_path, segment['spans'], cache_key=render_key(chosen))
+        return chosen, segment['number'], image_bytes, text
+
+    used_files = {file_id for file_id, number in exclude if number == 0}
+    chosen = pick_theory_paper(service, subject, exclude=used_files)
+    if not chosen:
+        return None
+    with get_pdf_cache().pinned(service, chosen) as pdf_path:
+        page = first_question_page(pdf_path)
+        image_bytes, text = render_region(pdf_path, page=page, cache_key=render_key(chosen))
+    return chosen, None, image_bytes, text
 
-    # Pick a random theory file
-    chosen = random.choice(filtered)
-    file_id, file_name = chosen['id'], chosen['name']
-    request = service.files().get_media(fileId=file_id)
-    fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-
-    # Sanitize filename
-    safe_name = re.sub(r'[^\w\-_.()]', '_', file_name)
-    os.makedirs('pdfs', exist_ok=True)
-    path = os.path.join('pdfs', safe_name)
-
-    fh.seek(0)  # 🧠 move pointer to start of the buffer
-    with open(path, 'wb') as f:
-     f.write(fh.read())
-
-
-
-    return path, file_name
-
-
-
-def extract_question_image_and_text(pdf_path):
-    images = convert_from_path(pdf_path, first_page=1, last_page=1)
-    img_path = pdf_path.replace(".pdf", ".png")
-    images[0].save(img_path, 'PNG')
-    doc = fitz.open(pdf_path)
-    first_page_text = doc[0].get_text()
-    doc.close()
-    return img_path, first_page_text
-
-def get_random_theory_question(subject="math"):
-    subject = subject.lower()
+def get_random_theory_question(subject="mathematics"):
+    subject = subject_key(subject)
     folder_id = FOLDER_IDS.get(subject)
 
-    print(f"\n[DEBUG] Getting question for subject: {subject}")
+    logger.info("question_requested subject=%s folder=%s", subject, folder_id)
     if not folder_id:
-        print(f"[ERROR] No folder ID found for subject: {subject}")
+        logger.error("no_folder subject=%s", subject)
         return None, None, None
 
     service = get_drive_service()
-    print(f"[DEBUG] Using folder ID: {folder_id}")
 
     try:
-        pdf_path, file_name = download_random_pdf(service, folder_id, subject)
-        if not pdf_path:
-            print("[ERROR] No suitable PDF found after filtering.")
+        rendered = render_question(service, subject)
+        if not rendered:
+            logger.error("no_theory_paper subject=%s", subject)
             return None, None, None
 
-        print(f"[DEBUG] Downloaded PDF: {file_name}")
-        img_path, question_text = extract_question_image_and_text(pdf_path)
-        print(f"[DEBUG] Extracted image path: {img_path}")
-        return img_path, question_text, file_name
-    except Exception as e:
-        print(f"[EXCEPTION] Failed to get theory question: {e}")
+        chosen, _, image_bytes, question_text = rendered
+        file_name = chosen['name']
+        logger.info("question_ready subject=%s file=%s", subject, file_name)
+        return as_file_buffer(image_bytes), question_text, file_name
+    except Exception:
+        logger.exception("question_failed subject=%s", subject)
         return None, None, None
 
 def find_matching_mark_scheme(file_name, service, subject):
-    if "_qp_" not in file_name:
+    record = parse_paper_name(file_name)
+    if not record or record.doc_type != "qp":
         return None
-    ms_name = file_name.replace("_qp_", "_ms_")
-    folder_id = FOLDER_IDS.get(subject, None)
-    if not folder_id:
+    paper_index = get_paper_index(service, subject)
+    if not paper_index:
         return None
-    all_files = list_pdfs_in_folder(service, folder_id)
-    for f in all_files:
-        if ms_name.lower() in f['name'].lower():
-            return f
-    return None
-
-def extract_mark_scheme_text(file_id, service):
-    request = service.files().get_media(fileId=file_id)
-    fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-    with open("/mnt/data/temp_ms.pdf", "wb") as f:
-        f.write(fh.getbuffer())
-
-    doc = fitz.open("/mnt/data/temp_ms.pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    doc.close()
-    return text
-
-def get_question_and_mark_scheme(subject="math"):
-    subject = subject.lower()
+    mark_scheme = paper_index.mark_scheme_for(record)
+    return mark_scheme.file if mark_scheme else None
+
+def extract_mark_scheme_text(file_id, service, question_number=None):
+    # Only the rows for question_number when it is given and the table could be split
+    file = get_index().get(file_id) or {'id': file_id}
+    text, slices = load_mark_scheme(file, lambda f: get_pdf_cache().pinned(service, f))
+    return slice_for_question(text, slices, question_number)
+
+def get_question_and_mark_scheme(subject="mathematics"):
+    subject = subject_key(subject)
     folder_id = FOLDER_IDS.get(subject)
     if not folder_id:
         return None, None, None, None
 
     service = get_drive_service()
-    pdf_path, file_name = download_random_pdf(service, folder_id, subject)
-    if not pdf_path:
+    rendered = render_question(service, subject)
+    if not rendered:
         return None, None, None, None
-
-    img_path, question_text = extract_question_image_and_text(pdf_path)
+    chosen, question_number, image_bytes, question_text = rendered
+    file_name = chosen['name']
 
     mark_scheme_file = find_matching_mark_scheme(file_name, service, subject)
     mark_scheme_text = ""
     if mark_scheme_file:
-        mark_scheme_text = extract_mark_scheme_text(mark_scheme_file['id'], service)
+        mark_scheme_text = extract_mark_scheme_text(
+            mark_scheme_file['id'], service, question_number=question_number)
+
+    return as_file_buffer(image_bytes), question_text, mark_scheme_text, file_name
+
+@dataclass
+class PreparedQuestion:
+    subject: str
+    image: bytes
+    text: str
+    source: dict
+    mark_scheme_id: str
+    question_number: int = None
+    prepared_at: float = field(default_factory=time.time)
+
+    @property
+    def key(self):
+        # Stable across re-segmentation, unlike the segment row id
+        return question_key(self.source['id'], self.question_number)
+
+    def image_file(self):
+        return as_file_buffer(self.image)
+
+def question_key(file_id, question_number=None):
+    return f"{file_id}#{question_number or 0}"
+
+def prepare_question(subject="mathematics", exclude=()):
+    # Everything needed to post a question, ready to be held in the warm pool.
+    # ``exclude`` is a set of question keys (see PreparedQuestion.key) to avoid.
+    subject = subject_key(subject)
+    if subject not in FOLDER_IDS:
+        return None
 
-    return img_path, question_text, mark_scheme_text, file_name
+    service = get_drive_service()
+    used = {(file_id, int(number)) for file_id, number in (key.rsplit("#", 1) for key in exclude)}
+    rendered = render_question(service, subject, exclude=used)
+    if not rendered:
+        return None
+    chosen, question_number, image_bytes, question_text = rendered
+    mark_scheme_file = find_matching_mark_scheme(chosen['name'], service, subject)
+    return PreparedQuestion(
+        subject=subject,
+        image=image_bytes,
+        text=question_text,
+        source=chosen,
+        mark_scheme_id=mark_scheme_file['id'] if mark_scheme_file else None,
+        question_number=question_number,
+    )
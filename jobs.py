@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Drive listing, downloads, PyMuPDF and SQLite index passes all block, so they run here
+# instead of on the discord.py event loop.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_GLOBAL_LIMIT = int(os.getenv("JOB_GLOBAL_LIMIT", str(JOB_WORKERS)))
+JOB_SUBJECT_LIMIT = int(os.getenv("JOB_SUBJECT_LIMIT", "2"))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "120"))
+# Index refreshes get their own small pool so they never hold slots interactive commands wait on
+MAINTENANCE_WORKERS = int(os.getenv("MAINTENANCE_WORKERS", "2"))
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """Handle for one piece of blocking work submitted to a JobRunner.
+
+    Cancelling a job stops the caller from waiting on it. The worker thread
+    cannot be interrupted, but functions that accept a ``cancel_event``
+    keyword can poll it and bail out early.
+    """
+
+    def __init__(self, subject):
+        self.subject = subject
+        self.cancel_event = threading.Event()
+        self._task = None
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self._task is not None:
+            self._task.cancel()
+
+
+class JobRunner:
+    def __init__(self, max_workers=JOB_WORKERS, global_limit=JOB_GLOBAL_LIMIT,
+                 subject_limit=JOB_SUBJECT_LIMIT, default_timeout=JOB_TIMEOUT, name="job"):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.global_limit = global_limit
+        self.subject_limit = subject_limit
+        self.default_timeout = default_timeout
+        self._global = None
+        self._subjects = {}
+
+    def _semaphores(self, subject):
+        # Created lazily so they bind to the running loop
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.global_limit)
+        if subject is None:
+            return [self._global]
+        if subject not in self._subjects:
+            self._subjects[subject] = asyncio.Semaphore(self.subject_limit)
+        return [self._subjects[subject], self._global]
+
+    def submit(self, fn, *args, subject=None, timeout=None, pass_cancel=False, **kwargs):
+        """Schedule ``fn`` on the job executor. Await ``result(job)`` for its return value.
+
+        ``timeout`` covers the whole job, including time spent waiting for a slot.
+        """
+        job = Job(subject)
+        if pass_cancel:
+            kwargs["cancel_event"] = job.cancel_event
+        timeout = self.default_timeout if timeout is None else timeout
+        job._task = asyncio.ensure_future(asyncio.wait_for(self._run(job, fn, args, kwargs), timeout))
+        return job
+
+    async def run(self, fn, *args, subject=None, timeout=None, pass_cancel=False, **kwargs):
+        job = self.submit(fn, *args, subject=subject, timeout=timeout, pass_cancel=pass_cancel, **kwargs)
+        return await result(job)
+
+    async def _run(self, job, fn, args, kwargs):
+        loop = asyncio.get_running_loop()
+        semaphores = []
+        try:
+            for sem in self._semaphores(job.subject):
+                await sem.acquire()
+                semaphores.append(sem)
+        except BaseException:
+            for sem in semaphores:
+                sem.release()
+            raise
+
+        def release(_):
+            # Slots are held until the worker thread really finishes, even if
+            # the caller stopped waiting, so the limits reflect actual load.
+            if loop.is_closed():
+                return
+            for sem in semaphores:
+                loop.call_soon_threadsafe(sem.release)
+
+        def call():
+            if job.cancelled:
+                raise JobCancelled()
+            return fn(*args, **kwargs)
+
+        try:
+            future = self.executor.submit(call)
+        except BaseException:
+            release(None)
+            raise
+        future.add_done_callback(release)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            job.cancel_event.set()
+            raise
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def result(job):
+    try:
+        return await job._task
+    except asyncio.CancelledError:
+        if job.cancelled:
+            raise JobCancelled()
+        raise
+
+
+_runner = None
+_maintenance_runner = None
+
+
+def get_runner():
+    global _runner
+    if _runner is None:
+        _runner = JobRunner()
+    return _runner
+
+
+def get_maintenance_runner():
+    """Runner for background index maintenance, separate from interactive work."""
+    global _maintenance_runner
+    if _maintenance_runner is None:
+        _maintenance_runner = JobRunner(max_workers=MAINTENANCE_WORKERS, global_limit=MAINTENANCE_WORKERS,
+                                        subject_limit=MAINTENANCE_WORKERS, name="maintenance")
+    return _maintenance_runner
+
+
+async def run_for_interaction(interaction, fn, *args, subject=None, timeout=None,
+                              render=None, ephemeral=False, **kwargs):
+    """Defer ``interaction``, run ``fn`` as a job and send the result as a follow-up.
+
+    ``render`` turns the job result into keyword arguments for
+    ``interaction.followup.send``; by default the result is sent as content.
+    """
+    if not interaction.response.is_done():
+        await interaction.response.defer(thinking=True, ephemeral=ephemeral)
+    try:
+        value = await get_runner().run(fn, *args, subject=subject, timeout=timeout, **kwargs)
+    except asyncio.TimeoutError:
+        await interaction.followup.send("⏳ That took too long. Please try again in a moment.", ephemeral=True)
+        return
+    except JobCancelled:
+        await interaction.followup.send("⚠️ That request was cancelled.", ephemeral=True)
+        return
+    except Exception:
+        ERRORS.inc(component="job")
+        logger.exception("job_failed fn=%s subject=%s", getattr(fn, "__name__", fn), subject)
+        await interaction.followup.send("❌ Something went wrong while preparing that.", ephemeral=True)
+        return
+    message = render(value) if render else {"content": str(value)}
+    await interaction.followup.send(ephemeral=ephemeral, **message)
@@ -0,0 +1,174 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+LINK_STORE_PATH = os.getenv("LINK_STORE_PATH", "shared_links.db")
+LINKS_PAGE_SIZE = 10
+READ_CACHE_SIZE = 256
+
+STATUS_PENDING = "pending"
+STATUS_APPROVED = "approved"
+STATUS_REJECTED = "rejected"
+# New submissions are visible straight away unless moderation is switched on
+DEFAULT_STATUS = os.getenv("SHARED_LINK_DEFAULT_STATUS", STATUS_APPROVED)
+
+# Query parameters that do not change what a link points at
+TRACKING_PARAMS = {"usp", "fbclid", "gclid", "ref", "si"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_links (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    grp TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    content TEXT NOT NULL,
+    normalized TEXT NOT NULL,
+    status TEXT NOT NULL,
+    user_id INTEGER,
+    created_at REAL NOT NULL,
+    UNIQUE (grp, subject, normalized)
+);
+CREATE INDEX IF NOT EXISTS shared_links_lookup ON shared_links (grp, subject, status, id);
+"""
+# PRAGMA user_version once links filed under subject aliases have been moved to subject keys
+SUBJECT_KEYS_VERSION = 1
+
+
+def normalize_link(content):
+    """Canonical form used for de-duplication; free-text notes are only whitespace/case folded."""
+    content = content.strip()
+    parts = urlsplit(content)
+    if parts.scheme.lower() not in ("http", "https") or not parts.netloc:
+        return re.sub(r'\s+', ' ', content).casefold()
+
+    netloc = parts.netloc.lower()
+    if netloc.endswith(":80") or netloc.endswith(":443"):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in TRACKING_PARAMS and not k.lower().startswith("utm_"))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https", netloc, path, urlencode(query), ""))
+
+
+class LinkStore:
+    """Durable store for links and notes shared through /addnotes.
+
+    Reads are keyset-paginated on the row id and go through a small
+    in-memory cache that is invalidated per (group, subject) on writes.
+    """
+
+    def __init__(self, path=LINK_STORE_PATH, cache_size=READ_CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+
+    def _invalidate(self, group, subject):
+        for key in [k for k in self._cache if k[0] == group and k[1] == subject]:
+            del self._cache[key]
+
+    def add(self, group, subject, content, user_id=None, status=DEFAULT_STATUS):
+        """Store a submission. Returns ``(id, created)``; ``created`` is False for duplicates."""
+        normalized = normalize_link(content)
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO shared_links "
+                "(grp, subject, content, normalized, status, user_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (group, subject, content.strip(), normalized, status, user_id, time.time()))
+            self._db.commit()
+            if cur.rowcount:
+                self._invalidate(group, subject)
+                return cur.lastrowid, True
+            row = self._db.execute(
+                "SELECT id FROM shared_links WHERE grp = ? AND subject = ? AND normalized = ?",
+                (group, subject, normalized)).fetchone()
+            return row[0], False
+
+    def set_status(self, link_id, status):
+        with self._lock:
+            row = self._db.execute("SELECT grp, subject FROM shared_links WHERE id = ?", (link_id,)).fetchone()
+            if not row:
+                return False
+            self._db.execute("UPDATE shared_links SET status = ? WHERE id = ?", (status, link_id))
+            self._db.commit()
+            self._invalidate(*row)
+            return True
+
+    def merge_subjects(self, renames):
+        """Move links filed under an old subject name to its new one; ``renames`` maps old -> new.
+
+        Links already present under the new name are dropped as duplicates.
+        Returns the number of links moved.
+        """
+        renames = [(new, old) for old, new in renames.items() if old != new]
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                "UPDATE OR IGNORE shared_links SET subject = ? WHERE subject = ?", renames)
+            moved = self._db.total_changes - before
+            self._db.executemany(
+                "DELETE FROM shared_links WHERE subject = ?", [(old,) for _, old in renames])
+            self._db.commit()
+            self._cache.clear()
+            return moved
+
+    def migrate_subject_keys(self, renames):
+        """``merge_subjects`` run once per database, recorded in its schema version.
+
+        Returns the number of links moved, 0 if the migration had already run.
+        """
+        with self._lock:
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SUBJECT_KEYS_VERSION:
+            return 0
+        moved = self.merge_subjects(renames)
+        with self._lock:
+            self._db.execute(f"PRAGMA user_version = {SUBJECT_KEYS_VERSION}")
+            self._db.commit()
+        return moved
+
+    def page(self, group, subject, after=0, limit=LINKS_PAGE_SIZE, status=STATUS_APPROVED):
+        """Return ``(links, next_cursor)``; ``links`` are ``(id, content)`` rows after ``after``."""
+        key = (group, subject, after, limit, status)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+            rows = self._db.execute(
+                "SELECT id, content FROM shared_links "
+                "WHERE grp = ? AND subject = ? AND status = ? AND id > ? ORDER BY id LIMIT ?",
+                (group, subject, status, after, limit + 1)).fetchall()
+            links = rows[:limit]
+            next_cursor = links[-1][0] if len(rows) > limit else None
+            result = (links, next_cursor)
+            self._cache[key] = result
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            return result
+
+    def count(self, group, subject, status=STATUS_APPROVED):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM shared_links WHERE grp = ? AND subject = ? AND status = ?",
+                (group, subject, status)).fetchone()[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_link_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LinkStore()
+        return _store
@@ -0,0 +1,124 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import fitz  # PyMuPDF
+
+from metrics import stage
+
+MARK_SCHEME_CACHE_PATH = os.getenv("MARK_SCHEME_CACHE_PATH", "mark_schemes.db")
+
+# Row labels in the Question column: "1", "3(a)", "4(b)(ii)"
+ROW_LABEL_RE = re.compile(r'^\s*(\d{1,2})((?:\s*\([a-z]{1,4}\))*)\s*(?:\n|$)')
+LABEL_COLUMN = 0.2  # labels sit in the leftmost fifth of the page
+TABLE_HEADINGS = {"question", "answer", "marks", "guidance", "partial marks"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mark_schemes (
+    file_id TEXT PRIMARY KEY,
+    md5 TEXT,
+    text TEXT NOT NULL,
+    slices TEXT NOT NULL,
+    extracted_at REAL NOT NULL
+);
+"""
+
+
+def extract_mark_scheme(pdf_path):
+    """Extract the full text of a mark scheme and split it per question.
+
+    Returns ``(text, slices)`` where ``slices`` maps the top-level question
+    number to the table rows for that question. The generic marking
+    principles before the first row are only kept in the full text.
+    """
+    pages = []
+    parts = {}
+    current = None
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            pages.append(page.get_text())
+            limit = page.rect.width * LABEL_COLUMN
+            for x0, y0, x1, y1, text, _, block_type in sorted(
+                    page.get_text("blocks"), key=lambda b: (b[1], b[0])):
+                if block_type != 0 or text.strip().lower() in TABLE_HEADINGS:
+                    continue
+                match = ROW_LABEL_RE.match(text)
+                if match and x0 < limit:
+                    number = int(match.group(1))
+                    # Rows only move forward; a smaller number is a mark value
+                    if current is None or number >= current:
+                        current = number
+                if current is not None:
+                    parts.setdefault(current, []).append(text.strip())
+    slices = {number: "\n".join(chunks) for number, chunks in parts.items()}
+    return "".join(pages), slices
+
+
+class MarkSchemeCache:
+    """Extracted mark-scheme text and per-question slices keyed by file id and md5."""
+
+    def __init__(self, path=MARK_SCHEME_CACHE_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def get(self, file_id, md5):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT md5, text, slices FROM mark_schemes WHERE file_id = ?", (file_id,)).fetchone()
+        if not row or row[0] != md5:
+            return None
+        return row[1], {int(k): v for k, v in json.loads(row[2]).items()}
+
+    def put(self, file_id, md5, text, slices):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO mark_schemes (file_id, md5, text, slices, extracted_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (file_id, md5, text, json.dumps(slices), time.time()))
+            self._db.commit()
+
+    def all(self):
+        with self._lock:
+            rows = self._db.execute("SELECT file_id, text, slices FROM mark_schemes").fetchall()
+        return [(r[0], r[1], {int(k): v for k, v in json.loads(r[2]).items()}) for r in rows]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_mark_scheme_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MarkSchemeCache()
+        return _cache
+
+
+def load_mark_scheme(file, fetch):
+    """Return ``(text, slices)`` for a mark-scheme file, extracting it at most once per md5.
+
+    ``fetch(file)`` returns a context manager yielding a local path (such as
+    ``PdfCache.pinned``) and is only called on a cache miss.
+    """
+    cache = get_mark_scheme_cache()
+    md5 = file.get('md5Checksum')
+    cached = cache.get(file['id'], md5)
+    if cached is not None:
+        return cached
+    with fetch(file) as path, stage("extract_text", file_id=file['id']):
+        text, slices = extract_mark_scheme(path)
+    cache.put(file['id'], md5, text, slices)
+    return text, slices
+
+
+def slice_for_question(text, slices, question_number):
+    # Fall back to the whole scheme when the table could not be split
+    if question_number is not None and question_number in slices:
+        return slices[question_number]
+    return text
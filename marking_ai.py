@@ -1,10 +1,17 @@
-import openai
 import os
+from metrics import stage
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-def evaluate_answer(question_text, user_answer, mark_scheme_text):
-    prompt = f"""
+def get_openai():
+    # Imported on first use so the bot starts without loading the OpenAI client
+    import openai
+    if openai.api_key is None:
+        openai.api_key = OPENAI_API_KEY
+    return openai
+
+def build_prompt(question_text, user_answer, mark_scheme_text):
+    return f"""
 You are an IGCSE exam marker. Given the question, a student's answer, and the official mark scheme, assess the answer fairly.
 Return only the number of marks awarded and a one-line explanation.
 
@@ -19,11 +26,16 @@ Mark Scheme:
 
 Mark Awarded:"""
 
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.3
-    )
+def evaluate_answer(question_text, user_answer, mark_scheme_text):
+    # Pass only the mark-scheme rows for this question (see mark_schemes.slice_for_question)
+    prompt = build_prompt(question_text, user_answer, mark_scheme_text)
+    openai = get_openai()
+    with stage("llm_marking"):
+        response = openai.ChatCompletion.create(
+            model="gpt-4",
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3
+        )
     return response.choices[0].message['content'].strip()
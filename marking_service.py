@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+import os
+import random
+import re
+import time
+from collections import OrderedDict, deque
+
+from marking_ai import build_prompt, get_openai
+from metrics import stage
+
+MARKING_MODEL = os.getenv("MARKING_MODEL", "gpt-4")
+# Point at any OpenAI-compatible server, e.g. a local stub for testing
+MARKING_API_BASE = os.getenv("MARKING_API_BASE")
+MARKING_CONCURRENCY = int(os.getenv("MARKING_CONCURRENCY", "4"))
+MARKING_TIMEOUT = float(os.getenv("MARKING_TIMEOUT", "60"))
+MARKING_MAX_RETRIES = int(os.getenv("MARKING_MAX_RETRIES", "5"))
+MARKING_CACHE_SIZE = int(os.getenv("MARKING_CACHE_SIZE", "2048"))
+
+
+class RetryableMarkingError(Exception):
+    """Raised by a backend for failures worth retrying (rate limits, timeouts, 5xx)."""
+
+
+class MarkingServiceClosed(Exception):
+    """Raised to callers whose request was still pending when the service closed."""
+
+
+class OpenAIBackend:
+    def __init__(self, model=MARKING_MODEL, api_base=MARKING_API_BASE, timeout=MARKING_TIMEOUT):
+        self.model = model
+        self.api_base = api_base
+        self.timeout = timeout
+
+    async def complete(self, prompt):
+        openai = get_openai()
+        kwargs = {"api_base": self.api_base} if self.api_base else {}
+        try:
+            response = await openai.ChatCompletion.acreate(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                request_timeout=self.timeout,
+                **kwargs,
+            )
+        except (openai.error.RateLimitError, openai.error.Timeout,
+                openai.error.APIConnectionError, openai.error.ServiceUnavailableError) as e:
+            raise RetryableMarkingError(str(e)) from e
+        except openai.error.APIError as e:
+            if getattr(e, "http_status", None) and e.http_status >= 500:
+                raise RetryableMarkingError(str(e)) from e
+            raise
+        usage = response.get("usage", {})
+        return response.choices[0].message['content'].strip(), {
+            'prompt_tokens': usage.get('prompt_tokens', 0),
+            'completion_tokens': usage.get('completion_tokens', 0),
+        }
+
+
+def _normalize(text):
+    # Whitespace only; case can change the answer ("Co" vs "CO", "ms" vs "Ms")
+    return re.sub(r'\s+', ' ', (text or '')).strip()
+
+
+def cache_key(question_text, user_answer, mark_scheme_text):
+    h = hashlib.sha256()
+    for part in (question_text, user_answer, mark_scheme_text):
+        h.update(_normalize(part).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class MarkingService:
+    """Async front end for answer marking.
+
+    Requests are queued per user and served round-robin by a fixed number of
+    workers, so one student submitting many answers cannot starve the rest.
+    Identical (question, answer, mark scheme) triples are answered from an
+    LRU cache, and identical requests already in flight share one call.
+    """
+
+    def __init__(self, backend=None, concurrency=MARKING_CONCURRENCY, max_retries=MARKING_MAX_RETRIES,
+                 base_delay=1.0, max_delay=30.0, cache_size=MARKING_CACHE_SIZE):
+        self.backend = backend or OpenAIBackend()
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._queues = {}        # user id -> deque of (key, prompt, future)
+        self._rotation = deque() # users with pending work, in service order
+        self._ready = None
+        self._workers = []
+        self.stats = {
+            'requests': 0,
+            'cache_hits': 0,
+            'coalesced': 0,
+            'backend_calls': 0,
+            'retries': 0,
+            'errors': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+        }
+        self._latencies = deque(maxlen=1000)
+
+    def _start(self):
+        if self._workers:
+            return
+        self._ready = asyncio.Semaphore(0)
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+
+    async def mark(self, user_id, question_text, user_answer, mark_scheme_text):
+        self._start()
+        self.stats['requests'] += 1
+        key = cache_key(question_text, user_answer, mark_scheme_text)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.stats['cache_hits'] += 1
+            return self._cache[key]
+        if key in self._inflight:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        prompt = build_prompt(question_text, user_answer, mark_scheme_text)
+        queue = self._queues.get(user_id)
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._rotation.append(user_id)
+        queue.append((key, prompt, future))
+        self._ready.release()
+        return await asyncio.shield(future)
+
+    def _next_request(self):
+        user_id = self._rotation.popleft()
+        queue = self._queues[user_id]
+        request = queue.popleft()
+        if queue:
+            self._rotation.append(user_id)
+        else:
+            del self._queues[user_id]
+        return request
+
+    async def _worker(self):
+        while True:
+            await self._ready.acquire()
+            key, prompt, future = self._next_request()
+            try:
+                result = await self._call(prompt)
+            except asyncio.CancelledError:
+                self._inflight.pop(key, None)
+                if not future.done():
+                    future.set_exception(MarkingServiceClosed())
+                raise
+            except Exception as e:
+                self.stats['errors'] += 1
+                self._inflight.pop(key, None)
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            self._remember(key, result)
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.set_result(result)
+
+    async def _call(self, prompt):
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            self.stats['backend_calls'] += 1
+            try:
+                with stage("llm_marking"):
+                    text, usage = await self.backend.complete(prompt)
+            except RetryableMarkingError:
+                if attempt >= self.max_retries:
+                    raise
+                # Exponential backoff with full jitter
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                attempt += 1
+                self.stats['retries'] += 1
+                await asyncio.sleep(delay)
+                continue
+            self._latencies.append(time.perf_counter() - started)
+            self.stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+            self.stats['completion_tokens'] += usage.get('completion_tokens', 0)
+            return text
+
+    def _remember(self, key, result):
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def metrics(self):
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        result = dict(self.stats)
+        result.update({
+            'queued': sum(len(q) for q in self._queues.values()),
+            'cache_entries': len(self._cache),
+            'latency_p50': percentile(0.5),
+            'latency_p95': percentile(0.95),
+        })
+        return result
+
+    async def close(self):
+        """Stop the workers. Requests still queued fail with MarkingServiceClosed."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for queue in self._queues.values():
+            for _, _, future in queue:
+                if not future.done():
+                    future.set_exception(MarkingServiceClosed())
+        self._queues.clear()
+        self._rotation.clear()
+        self._inflight.clear()
+
+
+_service = None
+
+
+def get_marking_service():
+    global _service
+    if _service is None:
+        _service = MarkingService()
+    return _service
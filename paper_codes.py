@@ -0,0 +1,101 @@
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+
+# CIE file names look like 0580_s23_qp_42.pdf: syllabus, session + year,
+# document type, then paper and variant digits. Examiner reports and grade
+# thresholds cover a whole sitting and have no paper number.
+PAPER_NAME_RE = re.compile(
+    r'^(?P<syllabus>\d{4})_(?P<session>[msw])(?P<year>\d{2})_(?P<doc_type>[a-z]{2})'
+    r'(?:_(?P<paper>\d)(?P<variant>\d)?)?\.pdf$',
+    re.IGNORECASE,
+)
+
+SESSIONS = {
+    "m": "February/March",
+    "s": "May/June",
+    "w": "October/November",
+}
+
+DOC_TYPES = {
+    "qp": "Question Paper",
+    "ms": "Mark Scheme",
+    "in": "Insert",
+    "er": "Examiner Report",
+    "gt": "Grade Thresholds",
+}
+
+
+@dataclass(frozen=True)
+class PaperRecord:
+    syllabus: str
+    session: str
+    year: int
+    doc_type: str
+    paper: int
+    variant: int
+    file: dict
+
+    @property
+    def key(self):
+        return (self.syllabus, self.session, self.year, self.doc_type, self.paper, self.variant)
+
+    def with_type(self, doc_type):
+        return (self.syllabus, self.session, self.year, doc_type, self.paper, self.variant)
+
+
+def parse_paper_name(name, file=None):
+    """Parse a CIE file name into a PaperRecord, or None if it does not follow the scheme."""
+    match = PAPER_NAME_RE.match(name.strip())
+    if not match:
+        return None
+    return PaperRecord(
+        syllabus=match['syllabus'],
+        session=match['session'].lower(),
+        year=2000 + int(match['year']),
+        doc_type=match['doc_type'].lower(),
+        paper=int(match['paper'] or 0),
+        variant=int(match['variant'] or 0),
+        file=file if file is not None else {'name': name},
+    )
+
+
+class PaperIndex:
+    """Hash indexes over parsed CIE file names.
+
+    ``theory_papers`` maps a subject to the set of paper numbers that count as
+    theory papers for it, e.g. ``{"mathematics": {2, 4}}``.
+    """
+
+    def __init__(self, theory_papers=None):
+        self.theory_papers = theory_papers or {}
+        self.by_key = {}
+        self.by_sitting = defaultdict(list)
+        self.theory = defaultdict(list)
+
+    def add(self, subject, file):
+        record = parse_paper_name(file['name'], file)
+        if record is None:
+            return None
+        self.by_key[record.key] = record
+        self.by_sitting[(subject, record.year, record.session)].append(record)
+        if record.doc_type == "qp" and record.paper in self.theory_papers.get(subject, ()):
+            self.theory[subject].append(record)
+        return record
+
+    def add_all(self, subject, files):
+        for f in files:
+            self.add(subject, f)
+        return self
+
+    def lookup(self, syllabus, session, year, doc_type, paper=0, variant=0):
+        return self.by_key.get((syllabus, session, year, doc_type, paper, variant))
+
+    def mark_scheme_for(self, record):
+        return self.by_key.get(record.with_type("ms"))
+
+    def sitting(self, subject, year, session):
+        return self.by_sitting.get((subject, year, session), [])
+
+    def theory_for(self, subject):
+        return self.theory.get(subject, [])
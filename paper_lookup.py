@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from catalog import PAST_PAPERS, get_catalog
+
+logger = logging.getLogger(__name__)
+
+PAPER_BOARD = "CIE"
+PAPER_INDEX_REFRESH_MINUTES = float(os.getenv("PAPER_INDEX_REFRESH_MINUTES", "15"))
+PAPER_CACHE_SIZE = 256
+
+# (index generation, subject, year, session, paper, variant) -> lookup result; a
+# Drive change bumps the generation, so stale results are never served
+_results = OrderedDict()
+_results_lock = threading.Lock()
+
+
+def _drive_index():
+    # Imported on first use; the Drive client stack is not needed at startup
+    from drive_client import get_drive_provider
+    from drive_index import get_index
+    return get_index(service_factory=lambda: get_drive_provider().service())
+
+
+def file_url(file):
+    return f"https://drive.google.com/file/d/{file['id']}/view"
+
+
+def generation():
+    return _drive_index().generation
+
+
+def paper_index(subject):
+    """PaperIndex for ``subject`` built from the local Drive index only; never calls Drive.
+
+    Returns None until the subject's folder has been indexed by ``refresh``.
+    """
+    from drive_utils import local_paper_index
+    return local_paper_index(subject, get_catalog().folder_id(PAST_PAPERS, PAPER_BOARD, subject))
+
+
+def find_paper(subject, year, session, paper, variant=None):
+    """Look up one sitting's documents.
+
+    Returns ``{'qp': file, 'ms': file, 'er': file}`` with None for anything
+    missing, or None if the subject has not been indexed yet. Without a
+    variant the lowest one available for the paper is used. Opens the
+    Drive index, so call it from a job rather than the event loop.
+    """
+    catalog = get_catalog()
+    key = catalog.canonical(subject)
+    entry = catalog.subjects.get(key)
+    if not entry or not entry.syllabus:
+        return None
+    cache_key = (generation(), key, year, session, paper, variant)
+    with _results_lock:
+        found = _results.get(cache_key)
+        if found is not None:
+            _results.move_to_end(cache_key)
+            return found
+    found = _lookup(entry, year, session, paper, variant)
+    if found is not None:
+        with _results_lock:
+            _results[cache_key] = found
+            while len(_results) > PAPER_CACHE_SIZE:
+                _results.popitem(last=False)
+    return found
+
+
+def _lookup(entry, year, session, paper, variant):
+    index = paper_index(entry.key)
+    if index is None:
+        return None
+    key = entry.key
+    syllabus = entry.syllabus
+
+    qp = None
+    if variant is not None:
+        qp = index.lookup(syllabus, session, year, "qp", paper, variant)
+    else:
+        candidates = sorted((r for r in index.sitting(key, year, session)
+                             if r.doc_type == "qp" and r.paper == paper), key=lambda r: r.variant)
+        qp = candidates[0] if candidates else None
+        variant = qp.variant if qp else 0
+    ms = index.lookup(syllabus, session, year, "ms", paper, variant)
+    er = index.lookup(syllabus, session, year, "er")
+    return {
+        'variant': variant,
+        'qp': qp.file if qp else None,
+        'ms': ms.file if ms else None,
+        'er': er.file if er else None,
+    }
+
+
+def refresh(subjects=None):
+    """Bring the local Drive index up to date and prebuild the paper indexes.
+
+    Runs in the background; the first pass scans each subject folder, later
+    passes only read the Drive changes feed. Returns the number of subjects indexed.
+    """
+    from drive_utils import get_drive_service
+    catalog = get_catalog()
+    service = get_drive_service()
+    index = _drive_index()
+    done = 0
+    for subject in subjects or [s.key for s in catalog.subjects_for(PAST_PAPERS, PAPER_BOARD)]:
+        folder_id = catalog.folder_id(PAST_PAPERS, PAPER_BOARD, subject)
+        try:
+            index.ensure_fresh(service, folder_id)
+            paper_index(subject)
+            done += 1
+        except Exception:
+            logger.exception("paper_index_refresh_failed subject=%s", subject)
+    return done
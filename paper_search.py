@@ -0,0 +1,210 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+from metrics import stage
+from paper_codes import DOC_TYPES, SESSIONS, parse_paper_name
+
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "paper_search.db")
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", str(os.cpu_count() or 1)))
+# Papers fetched, extracted and committed together; bounds disk use and how
+# long a write holds up searches
+SEARCH_BATCH_SIZE = int(os.getenv("SEARCH_BATCH_SIZE", "16"))
+MIN_SUGGEST_LENGTH = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    file_id TEXT PRIMARY KEY,
+    md5 TEXT,
+    name TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5 (
+    text,
+    file_id UNINDEXED,
+    subject UNINDEXED,
+    page UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_vocab USING fts5vocab (pages, 'row');
+"""
+
+
+def extract_pages(pdf_path):
+    # Runs in a worker process; fitz is imported here so the bot starts without it
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as doc:
+        return [page.get_text() for page in doc]
+
+
+def build_match(query):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r'\w+', query.lower())
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words[:-1]]
+    terms.append(f'"{words[-1]}"*')
+    return " ".join(terms)
+
+
+def describe_paper(name):
+    # "0580/42 May/June 2023" for CIE names, otherwise the file name itself
+    record = parse_paper_name(name)
+    if not record:
+        return name
+    code = f"{record.syllabus}/{record.paper}{record.variant or ''}" if record.paper else record.syllabus
+    kind = "" if record.doc_type == "qp" else f" {DOC_TYPES.get(record.doc_type, record.doc_type.upper())}"
+    return f"{code} {SESSIONS.get(record.session, record.session)} {record.year}{kind}"
+
+
+def is_question_paper(name):
+    # Mark schemes and reports would drown out the questions; files that do
+    # not follow the CIE naming scheme are indexed anyway.
+    record = parse_paper_name(name)
+    return record is None or record.doc_type == "qp"
+
+
+class PaperSearchIndex:
+    """SQLite FTS5 index over the text of every page in the past-paper corpus.
+
+    Searches use their own read-only connection. Under WAL they see the last
+    committed batch and never wait on ``_lock``, which an update holds while
+    writing.
+    """
+
+    def __init__(self, path=SEARCH_INDEX_PATH, workers=SEARCH_WORKERS, batch_size=SEARCH_BATCH_SIZE):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self._read_lock = threading.Lock()
+        self._reader = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True, check_same_thread=False)
+
+    def indexed(self, subject):
+        with self._lock:
+            return dict(self._db.execute(
+                "SELECT file_id, md5 FROM docs WHERE subject = ?", (subject,)).fetchall())
+
+    def update(self, subject, files, fetch):
+        """Index files that are new or whose md5Checksum changed; drop ones that are gone.
+
+        ``fetch(file)`` returns a context manager yielding a local path (such
+        as ``PdfCache.pinned``) and is only called for files that need
+        extracting. Files are fetched, extracted and committed in batches, so
+        searches keep running during a first build. Returns the number of
+        files (re)indexed.
+        """
+        known = self.indexed(subject)
+        current = {f['id'] for f in files}
+        pending = [f for f in files if known.get(f['id'], object()) != f.get('md5Checksum')]
+        removed = [file_id for file_id in known if file_id not in current]
+
+        if pending:
+            with stage("extract_text", files=len(pending)), ProcessPoolExecutor(max_workers=self.workers) as pool:
+                for start in range(0, len(pending), self.batch_size):
+                    batch = pending[start:start + self.batch_size]
+                    with ExitStack() as pins:
+                        paths = [pins.enter_context(fetch(f)) for f in batch]
+                        extracted = list(pool.map(extract_pages, paths))
+                    with self._lock:
+                        self._delete([f['id'] for f in batch])
+                        for file, page_texts in zip(batch, extracted):
+                            self._db.execute(
+                                "INSERT INTO docs (file_id, md5, name, subject, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                                (file['id'], file.get('md5Checksum'), file['name'], subject, time.time()))
+                            self._db.executemany(
+                                "INSERT INTO pages (text, file_id, subject, page) VALUES (?, ?, ?, ?)",
+                                [(text, file['id'], subject, n + 1)
+                                 for n, text in enumerate(page_texts) if text.strip()])
+                        self._db.commit()
+        if removed:
+            with self._lock:
+                self._delete(removed)
+                self._db.commit()
+        return len(pending)
+
+    def _delete(self, file_ids):
+        for file_id in file_ids:
+            self._db.execute("DELETE FROM pages WHERE file_id = ?", (file_id,))
+            self._db.execute("DELETE FROM docs WHERE file_id = ?", (file_id,))
+
+    def search(self, query, subject=None, limit=10):
+        match = build_match(query)
+        if not match:
+            return []
+        sql = ("SELECT p.file_id, d.name, p.subject, p.page, "
+               "snippet(pages, 0, '**', '**', '…', 12), bm25(pages) AS score "
+               "FROM pages p JOIN docs d ON d.file_id = p.file_id WHERE pages MATCH ?")
+        params = [match]
+        if subject:
+            sql += " AND p.subject = ?"
+            params.append(subject)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        with self._read_lock:
+            try:
+                rows = self._reader.execute(sql, params).fetchall()
+            except sqlite3.OperationalError:
+                return []
+        return [{
+            'file_id': r[0],
+            'name': r[1],
+            'paper': describe_paper(r[1]),
+            'subject': r[2],
+            'page': r[3],
+            'snippet': re.sub(r'\s+', ' ', r[4]).strip(),
+            'score': r[5],
+        } for r in rows]
+
+    def suggest(self, prefix, limit=25):
+        """Indexed words starting with ``prefix``, most widespread first."""
+        prefix = prefix.lower().strip()
+        if len(prefix) < MIN_SUGGEST_LENGTH:
+            return []
+        with self._read_lock:
+            rows = self._reader.execute(
+                "SELECT term FROM pages_vocab WHERE term >= ? AND term < ? "
+                "ORDER BY doc DESC LIMIT ?",
+                (prefix, prefix + "\uffff", limit)).fetchall()
+        return [r[0] for r in rows]
+
+    def complete(self, query, limit=25):
+        # Autocomplete for the whole query: keep earlier words, complete the last one
+        head, _, last = query.rpartition(" ")
+        head = f"{head} " if head else ""
+        return [f"{head}{term}" for term in self.suggest(last, limit)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PaperSearchIndex()
+        return _index
+
+
+def update_folders(folders):
+    """Bring the search index up to date for ``{subject: drive_folder_id}``."""
+    from drive_utils import get_drive_service, list_pdfs_in_folder
+    from pdf_cache import get_pdf_cache
+
+    service = get_drive_service()
+    cache = get_pdf_cache()
+    index = get_search_index()
+    total = 0
+    for subject, folder_id in folders.items():
+        files = [f for f in list_pdfs_in_folder(service, folder_id) if is_question_paper(f['name'])]
+        total += index.update(subject, files, lambda f: cache.pinned(service, f))
+    return total
@@ -0,0 +1,169 @@
+import glob
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from drive_access import get_drive_access
+from metrics import stage
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "pdfs")
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Each chunk is written straight to disk, so this bounds memory per download
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("PDF_DOWNLOAD_CHUNK_SIZE", str(4 * 1024 * 1024)))
+
+
+class PdfCache:
+    """Disk cache of Drive PDFs keyed by file id and md5Checksum.
+
+    A new md5 for the same file id is a new entry, so edited papers are
+    fetched again and the stale copy ages out. Entries are evicted least
+    recently used first once the directory exceeds ``max_bytes``. Paths
+    handed out through ``pinned`` are never evicted while in use.
+    """
+
+    def __init__(self, root=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # path -> size, oldest first
+        self._pins = {}  # path -> number of holders
+        self._size = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        # Rebuild LRU order from mtimes, which are bumped on every hit
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith(".part"):
+                os.remove(path)
+                continue
+            if not name.endswith(".pdf"):
+                continue
+            st = os.stat(path)
+            entries.append((st.st_mtime, path, st.st_size))
+        for _, path, size in sorted(entries):
+            self._entries[path] = size
+            self._size += size
+
+    def path_for(self, file_id, md5=None):
+        return os.path.join(self.root, f"{file_id}_{md5 or 'nomd5'}.pdf")
+
+    def get(self, service, file_id, md5=None, pin=False):
+        """Return a local path for the file, downloading it on a miss.
+
+        With ``pin`` the file stays on disk until ``release(path)``.
+        """
+        path = self.path_for(file_id, md5)
+        with self._lock:
+            size = self._entries.get(path)
+            if size is not None and os.path.exists(path):
+                self._entries.move_to_end(path)
+                if pin:
+                    self._pins[path] = self._pins.get(path, 0) + 1
+                self.hits += 1
+                self.bytes_saved += size
+                os.utime(path)
+                return path
+            self.misses += 1
+
+        # Concurrent misses for the same file share one download
+        size = get_drive_access().single_flight.do(
+            ("media", path), lambda: self._download(service, file_id, path))
+
+        with self._lock:
+            if path not in self._entries:
+                self._size += size
+            self._entries[path] = size
+            self._entries.move_to_end(path)
+            if pin:
+                self._pins[path] = self._pins.get(path, 0) + 1
+            self._evict(keep=path)
+        return path
+
+    def fetch(self, service, file, pin=False):
+        return self.get(service, file['id'], file.get('md5Checksum'), pin=pin)
+
+    def release(self, path):
+        with self._lock:
+            count = self._pins.get(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+                return
+            self._pins.pop(path, None)
+            # Eviction may have been held back by this pin
+            self._evict()
+
+    @contextmanager
+    def pinned(self, service, file):
+        """Local path for ``file`` that cannot be evicted until the block exits."""
+        path = self.fetch(service, file, pin=True)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def _download(self, service, file_id, path):
+        request = service.files().get_media(fileId=file_id)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, 'wb') as fh, stage("download", file_id=file_id):
+                get_drive_access().download(request, fh, self.chunk_size)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return size
+
+    def _evict(self, keep=None):
+        # Oldest first, skipping files someone is still reading
+        for path in list(self._entries):
+            if self._size <= self.max_bytes:
+                break
+            if path == keep or path in self._pins:
+                continue
+            size = self._entries.pop(path)
+            self._size -= size
+            self.evictions += 1
+            # Also drop anything derived from the PDF, e.g. rendered pages
+            for derived in glob.glob(glob.escape(os.path.splitext(path)[0]) + ".*"):
+                try:
+                    os.remove(derived)
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'pinned': len(self._pins),
+                'bytes': self._size,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_pdf_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PdfCache()
+        return _cache
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from drive_index import get_index
+from drive_utils import FOLDER_IDS, prepare_question, subject_key
+from jobs import get_runner
+from metrics import ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Refill starts once a subject drops below the low watermark and stops at the high one
+POOL_LOW_WATERMARK = int(os.getenv("QUESTION_POOL_LOW", "1"))
+POOL_HIGH_WATERMARK = int(os.getenv("QUESTION_POOL_HIGH", "3"))
+# Pause refilling a subject for this long after a failed attempt
+POOL_RETRY_DELAY = float(os.getenv("QUESTION_POOL_RETRY_DELAY", "60"))
+
+
+def indexed_modified_time(file_id):
+    entry = get_index().get(file_id)
+    return entry['modifiedTime'] if entry else None
+
+
+class QuestionPool:
+    """Keeps a few fully prepared questions per subject ready to serve.
+
+    ``producer(subject, exclude)`` builds one PreparedQuestion and runs on the
+    job executor. An entry is dropped at take time if its source file has been
+    modified (or removed) since it was prepared.
+    """
+
+    def __init__(self, subjects=None, low=POOL_LOW_WATERMARK, high=POOL_HIGH_WATERMARK,
+                 producer=prepare_question, modified_time=indexed_modified_time, runner=None):
+        self.subjects = list(subjects or FOLDER_IDS)
+        self.low = low
+        self.high = max(high, low)
+        self.producer = producer
+        self.modified_time = modified_time
+        self.runner = runner
+        self._queues = {s: deque() for s in self.subjects}
+        self._refills = {}
+        self._stats = {s: {'served': 0, 'misses': 0, 'expired': 0, 'refills': 0,
+                           'failures': 0, 'refill_seconds_total': 0.0,
+                           'last_refill_seconds': 0.0} for s in self.subjects}
+
+    def start(self):
+        for subject in self.subjects:
+            self._schedule_refill(subject)
+
+    def depth(self, subject):
+        return len(self._queues.get(subject, ()))
+
+    def _schedule_refill(self, subject):
+        task = self._refills.get(subject)
+        if task is None or task.done():
+            self._refills[subject] = asyncio.ensure_future(self._refill(subject))
+
+    async def _produce(self, subject, exclude=(), timeout=None):
+        runner = self.runner or get_runner()
+        return await runner.run(self.producer, subject, exclude, subject=subject, timeout=timeout)
+
+    async def _refill(self, subject):
+        queue = self._queues[subject]
+        stats = self._stats[subject]
+        while len(queue) < self.high:
+            started = time.perf_counter()
+            try:
+                question = await self._produce(subject)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                ERRORS.inc(component="pool")
+                logger.exception("pool_refill_failed subject=%s", subject)
+                question = None
+            if question is None:
+                stats['failures'] += 1
+                # Back off; the next take() schedules another refill
+                await asyncio.sleep(POOL_RETRY_DELAY)
+                return
+            elapsed = time.perf_counter() - started
+            stats['refills'] += 1
+            stats['last_refill_seconds'] = elapsed
+            stats['refill_seconds_total'] += elapsed
+            queue.append(question)
+            logger.info("pool_refilled subject=%s depth=%d seconds=%.3f", subject, len(queue), elapsed)
+
+    def _is_fresh(self, question):
+        current = self.modified_time(question.source['id'])
+        return current is not None and current == question.source.get('modifiedTime')
+
+    def take_nowait(self, subject, exclude=()):
+        """Pop a ready question, or None if the pool for ``subject`` has none.
+
+        Questions whose key is in ``exclude`` stay queued for other callers.
+        """
+        subject = subject_key(subject)
+        queue = self._queues.get(subject)
+        if queue is None:
+            return None
+        stats = self._stats[subject]
+        question = None
+        skipped = []
+        while queue:
+            candidate = queue.popleft()
+            if not self._is_fresh(candidate):
+                stats['expired'] += 1
+            elif candidate.key in exclude:
+                skipped.append(candidate)
+            else:
+                question = candidate
+                break
+        queue.extendleft(reversed(skipped))
+        if len(queue) < self.low:
+            self._schedule_refill(subject)
+        if question is None:
+            stats['misses'] += 1
+        else:
+            stats['served'] += 1
+        return question
+
+    async def take(self, subject, exclude=(), timeout=None):
+        """Serve from the pool, falling back to preparing a question on demand."""
+        question = self.take_nowait(subject, exclude)
+        if question is not None:
+            return question
+        return await self._produce(subject_key(subject), exclude, timeout)
+
+    def metrics(self):
+        result = {}
+        for subject in self.subjects:
+            stats = dict(self._stats[subject])
+            stats['depth'] = self.depth(subject)
+            refills = stats['refills']
+            stats['avg_refill_seconds'] = stats['refill_seconds_total'] / refills if refills else 0.0
+            result[subject] = stats
+        return result
+
+    def stop(self):
+        for task in self._refills.values():
+            task.cancel()
+        self._refills.clear()
+
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = QuestionPool()
+        _pool.start()
+    return _pool
@@ -0,0 +1,286 @@
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+import fitz  # PyMuPDF
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_INDEX_PATH = os.getenv("SEGMENT_INDEX_PATH", "question_index.db")
+SEGMENT_WORKERS = int(os.getenv("SEGMENT_WORKERS", str(os.cpu_count() or 1)))
+# Papers fetched, segmented and committed together; keeps a pass within the PDF cache budget
+SEGMENT_BATCH_SIZE = int(os.getenv("SEGMENT_BATCH_SIZE", "16"))
+
+# A question starts with its number ("1", "2(a)", "3 (a)") in the left margin
+QUESTION_START_RE = re.compile(r'^\s*(\d{1,2})(?=\s|\(|$)')
+LEFT_MARGIN = 0.15      # fraction of page width the number must start in
+HEADER_BAND = 0.05      # top fraction of the page holding running headers
+FOOTER_BAND = 0.07      # bottom fraction holding page numbers, "© UCLES", "[Turn over"
+CLIP_PADDING = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    file_id TEXT PRIMARY KEY,
+    md5 TEXT,
+    name TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    segmented_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    file_id TEXT NOT NULL REFERENCES papers(file_id) ON DELETE CASCADE,
+    subject TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    spans TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS questions_subject ON questions (subject);
+CREATE INDEX IF NOT EXISTS questions_file ON questions (file_id);
+"""
+
+
+def _content_blocks(page):
+    height = page.rect.height
+    top, bottom = height * HEADER_BAND, height * (1 - FOOTER_BAND)
+    blocks = []
+    for x0, y0, x1, y1, text, _, block_type in page.get_text("blocks"):
+        if block_type != 0 or y1 < top or y0 > bottom:
+            continue
+        blocks.append((x0, y0, x1, y1, text))
+    return blocks
+
+
+def segment_paper(pdf_path):
+    """Find the page span and clip boxes of every numbered question in a paper.
+
+    Returns a list of ``{"number": n, "spans": [[page, x0, y0, x1, y1], ...]}``.
+    Numbers must run 1, 2, 3... so stray digits (marks, page numbers, table
+    values) in the margin are not mistaken for questions. The cover page and
+    "BLANK PAGE" pages are skipped.
+    """
+    with fitz.open(pdf_path) as doc:
+        pages = []  # (page_no, width, content_top, content_bottom, starts)
+        expected = 1
+        for page_no in range(1, len(doc)):
+            page = doc[page_no]
+            blocks = _content_blocks(page)
+            if not blocks or any("BLANK PAGE" in b[4] for b in blocks):
+                continue
+            width = page.rect.width
+            starts = []
+            for x0, y0, x1, y1, text in sorted(blocks, key=lambda b: (b[1], b[0])):
+                match = QUESTION_START_RE.match(text)
+                if match and x0 < width * LEFT_MARGIN and int(match.group(1)) == expected:
+                    starts.append((expected, y0))
+                    expected += 1
+            top = min(b[1] for b in blocks)
+            bottom = max(b[3] for b in blocks)
+            pages.append((page_no, width, top, bottom, starts))
+
+    questions = []
+    current = None
+    for page_no, width, top, bottom, starts in pages:
+        cursor = top
+        for number, y in starts:
+            if current is not None and y - CLIP_PADDING > cursor:
+                current["spans"].append([page_no, 0, cursor - CLIP_PADDING, width, y - CLIP_PADDING])
+            current = {"number": number, "spans": []}
+            questions.append(current)
+            cursor = y
+        if current is not None and bottom > cursor:
+            current["spans"].append([page_no, 0, cursor - CLIP_PADDING, width, bottom + CLIP_PADDING])
+    return [q for q in questions if q["spans"]]
+
+
+def first_question_page(pdf_path):
+    """Page number of the first page after the cover that starts a question.
+
+    Falls back to the first page after the cover with any content, then to
+    page 0 for single-page documents.
+    """
+    with fitz.open(pdf_path) as doc:
+        first_content = None
+        for page_no in range(1, len(doc)):
+            page = doc[page_no]
+            blocks = _content_blocks(page)
+            if not blocks or any("BLANK PAGE" in b[4] for b in blocks):
+                continue
+            if first_content is None:
+                first_content = page_no
+            margin = page.rect.width * LEFT_MARGIN
+            if any(b[0] < margin and QUESTION_START_RE.match(b[4]) for b in blocks):
+                return page_no
+    return first_content or 0
+
+
+class SegmentIndex:
+    """Persistent index of question locations across the question-paper corpus."""
+
+    def __init__(self, path=SEGMENT_INDEX_PATH, workers=SEGMENT_WORKERS, batch_size=SEGMENT_BATCH_SIZE):
+        self.path = path
+        self.workers = workers
+        self.batch_size = batch_size
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self._rows = {}  # subject -> [(row id, file id, number)], for O(1) random picks
+
+    def known_papers(self, subject):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT file_id, md5 FROM papers WHERE subject = ?", (subject,)).fetchall()
+        return dict(rows)
+
+    def _store(self, subject, file, questions):
+        self._db.execute("DELETE FROM papers WHERE file_id = ?", (file['id'],))
+        self._db.execute(
+            "INSERT INTO papers (file_id, md5, name, subject, segmented_at) VALUES (?, ?, ?, ?, ?)",
+            (file['id'], file.get('md5Checksum'), file['name'], subject, time.time()))
+        self._db.executemany(
+            "INSERT INTO questions (file_id, subject, number, spans) VALUES (?, ?, ?, ?)",
+            [(file['id'], subject, q["number"], json.dumps(q["spans"])) for q in questions])
+
+    def update(self, subject, files, fetch):
+        """Segment papers that are new or changed since the last pass.
+
+        ``files`` are Drive file dicts for the subject's question papers and
+        ``fetch(file)`` returns a context manager yielding a local path (such
+        as ``PdfCache.pinned``). Papers are processed and committed in batches
+        so only one batch needs to be on disk at a time. Papers that have
+        disappeared are dropped. Returns the number of papers segmented.
+        """
+        known = self.known_papers(subject)
+        current = {f['id'] for f in files}
+        pending = [f for f in files if known.get(f['id'], object()) != f.get('md5Checksum')]
+        removed = [file_id for file_id in known if file_id not in current]
+
+        segmented = 0
+        if pending:
+            with stage("segment", files=len(pending)), ProcessPoolExecutor(max_workers=self.workers) as pool:
+                for start in range(0, len(pending), self.batch_size):
+                    batch = pending[start:start + self.batch_size]
+                    with ExitStack() as pins:
+                        paths = [pins.enter_context(fetch(f)) for f in batch]
+                        results = list(pool.map(segment_paper, paths))
+                    with self._lock:
+                        for file, questions in zip(batch, results):
+                            self._store(subject, file, questions)
+                        self._db.commit()
+                        self._rows.pop(subject, None)
+                    segmented += len(batch)
+        if removed:
+            with self._lock:
+                self._db.executemany("DELETE FROM papers WHERE file_id = ?", [(r,) for r in removed])
+                self._db.commit()
+                self._rows.pop(subject, None)
+        return segmented
+
+    def _questions(self, subject):
+        with self._lock:
+            rows = self._rows.get(subject)
+            if rows is None:
+                rows = self._db.execute(
+                    "SELECT id, file_id, number FROM questions WHERE subject = ?", (subject,)).fetchall()
+                self._rows[subject] = rows
+            return rows
+
+    def count(self, subject):
+        return len(self._questions(subject))
+
+    def get(self, question_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT q.id, q.file_id, p.name, p.md5, q.subject, q.number, q.spans "
+                "FROM questions q JOIN papers p ON p.file_id = q.file_id WHERE q.id = ?",
+                (question_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            'id': row[0],
+            'file_id': row[1],
+            'name': row[2],
+            'md5Checksum': row[3],
+            'subject': row[4],
+            'number': row[5],
+            'spans': json.loads(row[6]),
+        }
+
+    def random_question(self, subject, exclude=()):
+        """Uniform pick over the indexed questions for ``subject``.
+
+        ``exclude`` holds ``(file_id, number)`` pairs, which survive
+        re-segmentation unlike row ids. Excluded questions are only returned
+        once every question of the subject is excluded.
+        """
+        rows = self._questions(subject)
+        if not rows:
+            return None
+        if exclude:
+            rows = [r for r in rows if (r[1], r[2]) not in exclude] or rows
+        return self.get(random.choice(rows)[0])
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_segment_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SegmentIndex()
+        return _index
+
+
+def update_subject(subject):
+    # Imported here so worker processes only need PyMuPDF
+    from drive_utils import get_drive_service, get_paper_index
+    from pdf_cache import get_pdf_cache
+
+    service = get_drive_service()
+    paper_index = get_paper_index(service, subject)
+    if not paper_index:
+        return 0
+    files = [record.file for record in paper_index.theory_for(subject)]
+    cache = get_pdf_cache()
+    return get_segment_index().update(subject, files, lambda f: cache.pinned(service, f))
+
+
+def update_subjects(subjects=None):
+    """Incremental pass over ``subjects``, every theory subject by default.
+
+    Returns the number of papers segmented.
+    """
+    from drive_utils import FOLDER_IDS
+    total = 0
+    for subject in subjects or FOLDER_IDS:
+        started = time.perf_counter()
+        try:
+            segmented = update_subject(subject)
+        except Exception:
+            logger.exception("segment_pass_failed subject=%s", subject)
+            continue
+        total += segmented
+        logger.info("segment_pass subject=%s papers=%d questions=%d seconds=%.1f",
+                    subject, segmented, get_segment_index().count(subject), time.perf_counter() - started)
+    return total
+
+
+def main(subjects):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    update_subjects(subjects)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,140 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import fitz  # PyMuPDF
+
+from metrics import stage
+
+RENDER_DPI = int(os.getenv("RENDER_DPI", "150"))
+# png, webp or jpeg. webp needs Pillow.
+RENDER_FORMAT = os.getenv("RENDER_FORMAT", "png").lower()
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+EXTENSIONS = {"png": "png", "webp": "webp", "jpeg": "jpg", "jpg": "jpg"}
+
+
+class RenderCache:
+    """In-memory LRU of encoded renders, bounded by total bytes."""
+
+    def __init__(self, max_bytes=RENDER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        data = entry[0]
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key)[0])
+            self._entries[key] = entry
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, (old, _) = self._entries.popitem(last=False)
+                self._size -= len(old)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._size,
+            }
+
+
+render_cache = RenderCache()
+
+
+def encode_pixmap(pix, fmt=RENDER_FORMAT):
+    if fmt == "png":
+        return pix.tobytes("png")
+    if fmt in ("jpeg", "jpg"):
+        return pix.tobytes("jpg", jpg_quality=85)
+    if fmt == "webp":
+        from PIL import Image
+        mode = "RGB" if pix.n >= 3 else "L"
+        img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+        buf = io.BytesIO()
+        img.save(buf, "WEBP", quality=80, method=4)
+        return buf.getvalue()
+    raise ValueError(f"Unsupported render format: {fmt}")
+
+
+def as_file_buffer(data, stem="question", fmt=RENDER_FORMAT):
+    # A fresh buffer per send; discord.File picks the filename up from .name
+    buf = io.BytesIO(data)
+    buf.name = f"{stem}.{EXTENSIONS.get(fmt, fmt)}"
+    return buf
+
+
+def render_region(pdf_path, page=0, clip=None, dpi=RENDER_DPI, fmt=RENDER_FORMAT, cache_key=None):
+    """Render one page (or a clip of it) and extract its text with a single open.
+
+    ``clip`` is an ``(x0, y0, x1, y1)`` tuple in PDF points. Results are cached
+    on ``(cache_key or pdf_path, page, clip, dpi, fmt)``. Returns ``(image_bytes, text)``.
+    """
+    clip = tuple(clip) if clip else None
+    key = (cache_key or pdf_path, page, clip, dpi, fmt)
+    cached = render_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with stage("render", page=page, dpi=dpi), fitz.open(pdf_path) as doc:
+        pdf_page = doc[page]
+        rect = fitz.Rect(clip) if clip else None
+        pix = pdf_page.get_pixmap(dpi=dpi, clip=rect, alpha=False)
+        text = pdf_page.get_text(clip=rect) if rect else pdf_page.get_text()
+    entry = (encode_pixmap(pix, fmt), text)
+    render_cache.put(key, entry)
+    return entry
+
+
+def render_spans(pdf_path, spans, dpi=RENDER_DPI, fmt=RENDER_FORMAT, cache_key=None):
+    """Render a question that may run over several pages as one image.
+
+    ``spans`` is a list of ``[page, x0, y0, x1, y1]`` clips. They are stacked
+    top to bottom on a scratch page and rasterized once. Returns ``(image_bytes, text)``.
+    """
+    if len(spans) == 1:
+        page, *clip = spans[0]
+        return render_region(pdf_path, page=page, clip=clip, dpi=dpi, fmt=fmt, cache_key=cache_key)
+
+    key = (cache_key or pdf_path, tuple(tuple(s) for s in spans), dpi, fmt)
+    cached = render_cache.get(key)
+    if cached is not None:
+        return cached
+
+    texts = []
+    with stage("render", pages=len(spans), dpi=dpi), fitz.open(pdf_path) as doc:
+        rects = [fitz.Rect(clip) for _, *clip in spans]
+        width = max(r.width for r in rects)
+        height = sum(r.height for r in rects)
+        with fitz.open() as scratch:
+            canvas = scratch.new_page(width=width, height=height)
+            y = 0
+            for (page, *_), rect in zip(spans, rects):
+                target = fitz.Rect(0, y, rect.width, y + rect.height)
+                canvas.show_pdf_page(target, doc, page, clip=rect)
+                texts.append(doc[page].get_text(clip=rect))
+                y += rect.height
+            pix = canvas.get_pixmap(dpi=dpi, alpha=False)
+    entry = (encode_pixmap(pix, fmt), "".join(texts))
+    render_cache.put(key, entry)
+    return entry
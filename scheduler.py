@@ -1,19 +1,415 @@
-from discord.ext import tasks
-from drive_utils import get_random_theory_question
+import asyncio
+import datetime as dt
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
 import discord
+from discord.ext import tasks
+
+from catalog import get_catalog
+from jobs import get_runner
+from metrics import ERRORS, stage
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_DB_PATH = os.getenv("SCHEDULE_DB_PATH", "schedules.db")
+# Off-peak window (UTC, HH:MM-HH:MM, may wrap midnight) in which each
+# schedule's next post is prepared, so posting itself is only an upload
+SCHEDULE_PREPARE_WINDOW = os.getenv("SCHEDULE_PREPARE_WINDOW", "02:00-05:00")
+# Posts still unprepared this close to their time are prepared outside the window
+SCHEDULE_PREPARE_LEAD_MINUTES = float(os.getenv("SCHEDULE_PREPARE_LEAD_MINUTES", "60"))
+# A question is not posted to the same server again within this many days
+SCHEDULE_NO_REPEAT_DAYS = int(os.getenv("SCHEDULE_NO_REPEAT_DAYS", "180"))
+# Pause a server's schedule for this long after a failed prepare or post
+SCHEDULE_RETRY_DELAY = float(os.getenv("SCHEDULE_RETRY_DELAY", "300"))
+PREPARE_TIMEOUT = 900
+
+# Discord rejects messages longer than this
+MESSAGE_LIMIT = 2000
+QUESTION_TEXT_LIMIT = 1200
+
+SCHEDULE_COLUMNS = "guild_id, channel_id, subjects, post_time, rotation, last_posted, updated_at, disabled_reason"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedules (
+    guild_id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    subjects TEXT NOT NULL,
+    post_time TEXT NOT NULL,
+    rotation INTEGER NOT NULL DEFAULT 0,
+    last_posted TEXT,
+    updated_at REAL NOT NULL,
+    disabled_reason TEXT
+);
+CREATE TABLE IF NOT EXISTS prepared_posts (
+    guild_id INTEGER NOT NULL,
+    post_date TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    question_key TEXT,
+    content TEXT NOT NULL,
+    image BLOB,
+    filename TEXT,
+    prepared_at REAL NOT NULL,
+    question_text TEXT,
+    mark_scheme TEXT,
+    PRIMARY KEY (guild_id, post_date)
+);
+CREATE TABLE IF NOT EXISTS post_history (
+    guild_id INTEGER NOT NULL,
+    question_key TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    posted_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS post_history_recent ON post_history (guild_id, posted_at);
+CREATE TABLE IF NOT EXISTS answer_keys (
+    guild_id INTEGER PRIMARY KEY,
+    subject TEXT NOT NULL,
+    question_text TEXT NOT NULL,
+    mark_scheme TEXT NOT NULL,
+    posted_at REAL NOT NULL
+);
+"""
+SCHEMA_VERSION = 2
+
+
+def parse_time(text):
+    """``HH:MM`` (24-hour) to a ``datetime.time``; raises ValueError otherwise."""
+    hour, _, minute = text.strip().partition(":")
+    return dt.time(int(hour), int(minute or 0))
+
+
+def parse_window(text):
+    start, _, end = text.partition("-")
+    return parse_time(start), parse_time(end)
+
+
+def in_window(moment, window):
+    start, end = window
+    now = moment.time()
+    if start <= end:
+        return start <= now < end
+    return now >= start or now < end
 
-def schedule_daily_question(bot, channel_id):
-    @tasks.loop(hours=24)
-    async def daily_post():
+
+def slot_start(post_date, post_time):
+    return dt.datetime.combine(post_date, post_time, tzinfo=dt.timezone.utc)
+
+
+def latest_slot(post_time, now):
+    """Date of the most recent post time at or before ``now``."""
+    today = now.date()
+    return today if now.time() >= post_time else today - dt.timedelta(days=1)
+
+
+def pending_slot(schedule, now):
+    """``(date, due)`` for the first slot not yet posted.
+
+    A slot in the past that was never posted (the bot was down) is due now;
+    only the latest one is caught up so a long outage does not flood the channel.
+    """
+    post_time = parse_time(schedule['post_time'])
+    latest = latest_slot(post_time, now)
+    if not schedule['last_posted'] or schedule['last_posted'] < latest.isoformat():
+        return latest, True
+    return latest + dt.timedelta(days=1), False
+
+
+def _fit(text, limit):
+    text = (text or "").strip()
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def format_post(subject, text, mark_scheme=None):
+    entry = get_catalog().subjects.get(subject)
+    content = f"📘 Daily Question ({entry.name if entry else subject.title()}):\n{_fit(text, QUESTION_TEXT_LIMIT)}"
+    room = MESSAGE_LIMIT - len(content) - len("\n\n**Mark scheme:** ||||")
+    if mark_scheme and room > 40:
+        content += f"\n\n**Mark scheme:** ||{_fit(mark_scheme, room)}||"
+    return content
+
+
+def build_post(question):
+    """Turn a PreparedQuestion into a ready-to-send post; runs on the job executor."""
+    from drive_utils import extract_mark_scheme_text, get_drive_service
+    mark_scheme = None
+    if question.mark_scheme_id:
         try:
-            channel = bot.get_channel(channel_id)
-            if channel:
-                img, text, _ = get_random_theory_question()
-                if img:
-                    await channel.send(content=f"📘 Daily Question:\n{text}", file=discord.File(img))
-                else:
-                    await channel.send("⚠️ No theory question found today.")
-        except Exception as e:
-            print(f"[SCHEDULER ERROR] {e}")
-
-    daily_post.start()
+            with stage("daily_prepare", subject=question.subject):
+                mark_scheme = extract_mark_scheme_text(
+                    question.mark_scheme_id, get_drive_service(), question.question_number)
+        except Exception:
+            logger.exception("daily_mark_scheme_failed subject=%s file=%s", question.subject, question.mark_scheme_id)
+    return {
+        'subject': question.subject,
+        'question_key': question.key,
+        'content': format_post(question.subject, question.text, mark_scheme),
+        'image': question.image,
+        'filename': question.image_file().name,
+        'question_text': question.text,
+        'mark_scheme': mark_scheme,
+    }
+
+
+class ScheduleStore:
+    """Per-server daily question schedules, their prepared posts and post history."""
+
+    def __init__(self, path=SCHEDULE_DB_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._migrate()
+        self._db.commit()
+
+    def _migrate(self):
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # Prepared posts keep the question and mark scheme for /markanswer
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(prepared_posts)")}
+            for column in ("question_text", "mark_scheme"):
+                if column not in columns:
+                    self._db.execute(f"ALTER TABLE prepared_posts ADD COLUMN {column} TEXT")
+        if version < 2:
+            # Schedules whose channel is gone or closed to the bot are switched off
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(schedules)")}
+            if "disabled_reason" not in columns:
+                self._db.execute("ALTER TABLE schedules ADD COLUMN disabled_reason TEXT")
+        self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @staticmethod
+    def _schedule(row):
+        return {
+            'guild_id': row[0],
+            'channel_id': row[1],
+            'subjects': json.loads(row[2]),
+            'post_time': row[3],
+            'rotation': row[4],
+            'last_posted': row[5],
+            'updated_at': row[6],
+            'disabled_reason': row[7],
+        }
+
+    def set(self, guild_id, channel_id, subjects, post_time, now=None):
+        """Create or replace a server's schedule. The first post is at the next ``post_time``."""
+        now = now or discord.utils.utcnow()
+        post_time = parse_time(post_time)
+        # Treat the most recent slot as done so saving a schedule does not post straight away
+        last_posted = latest_slot(post_time, now).isoformat()
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO schedules ({SCHEDULE_COLUMNS}) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?, NULL)",
+                (guild_id, channel_id, json.dumps(list(subjects)), post_time.strftime("%H:%M"),
+                 last_posted, time.time()))
+            self._db.execute("DELETE FROM prepared_posts WHERE guild_id = ?", (guild_id,))
+            self._db.commit()
+        return self.get(guild_id)
+
+    def remove(self, guild_id):
+        with self._lock:
+            cur = self._db.execute("DELETE FROM schedules WHERE guild_id = ?", (guild_id,))
+            self._db.execute("DELETE FROM prepared_posts WHERE guild_id = ?", (guild_id,))
+            self._db.commit()
+        return cur.rowcount > 0
+
+    def disable(self, guild_id, reason):
+        """Stop posting for a server until its schedule is set again."""
+        with self._lock:
+            self._db.execute("UPDATE schedules SET disabled_reason = ? WHERE guild_id = ?", (reason, guild_id))
+            self._db.execute("DELETE FROM prepared_posts WHERE guild_id = ?", (guild_id,))
+            self._db.commit()
+
+    def get(self, guild_id):
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {SCHEDULE_COLUMNS} FROM schedules WHERE guild_id = ?", (guild_id,)).fetchone()
+        return self._schedule(row) if row else None
+
+    def all(self):
+        with self._lock:
+            rows = self._db.execute(f"SELECT {SCHEDULE_COLUMNS} FROM schedules").fetchall()
+        return [self._schedule(row) for row in rows]
+
+    def prepared(self, guild_id, post_date):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT subject, question_key, content, image, filename, question_text, mark_scheme "
+                "FROM prepared_posts WHERE guild_id = ? AND post_date = ?", (guild_id, post_date)).fetchone()
+        if not row:
+            return None
+        return {'subject': row[0], 'question_key': row[1], 'content': row[2], 'image': row[3], 'filename': row[4],
+                'question_text': row[5], 'mark_scheme': row[6]}
+
+    def save_prepared(self, schedule, post_date, post):
+        """Store a prepared post unless the schedule was changed while it was being built."""
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT OR REPLACE INTO prepared_posts "
+                "(guild_id, post_date, subject, question_key, content, image, filename, prepared_at, "
+                "question_text, mark_scheme) "
+                "SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ? WHERE EXISTS "
+                "(SELECT 1 FROM schedules WHERE guild_id = ? AND updated_at = ?)",
+                (schedule['guild_id'], post_date, post['subject'], post['question_key'], post['content'],
+                 post['image'], post['filename'], time.time(), post.get('question_text'), post.get('mark_scheme'),
+                 schedule['guild_id'], schedule['updated_at']))
+            self._db.commit()
+        return cur.rowcount > 0
+
+    def mark_posted(self, guild_id, post_date, post=None, horizon_days=SCHEDULE_NO_REPEAT_DAYS):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE schedules SET last_posted = ?, rotation = rotation + 1 WHERE guild_id = ?",
+                (post_date, guild_id))
+            self._db.execute(
+                "DELETE FROM prepared_posts WHERE guild_id = ? AND post_date <= ?", (guild_id, post_date))
+            if post and post['question_key']:
+                self._db.execute(
+                    "INSERT INTO post_history (guild_id, question_key, subject, posted_at) VALUES (?, ?, ?, ?)",
+                    (guild_id, post['question_key'], post['subject'], now))
+            # /markanswer always refers to the latest post, so an older answer key is dropped
+            self._db.execute("DELETE FROM answer_keys WHERE guild_id = ?", (guild_id,))
+            if post and post.get('mark_scheme'):
+                self._db.execute(
+                    "INSERT INTO answer_keys (guild_id, subject, question_text, mark_scheme, posted_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (guild_id, post['subject'], post['question_text'] or "", post['mark_scheme'], now))
+            self._db.execute(
+                "DELETE FROM post_history WHERE guild_id = ? AND posted_at < ?",
+                (guild_id, now - horizon_days * 86400))
+            self._db.commit()
+
+    def recent_questions(self, guild_id, days=SCHEDULE_NO_REPEAT_DAYS):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT question_key FROM post_history WHERE guild_id = ? AND posted_at >= ?",
+                (guild_id, time.time() - days * 86400)).fetchall()
+        return {row[0] for row in rows}
+
+    def answer_key(self, guild_id):
+        """Question text and mark scheme of the server's latest daily post, if it had a mark scheme."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT subject, question_text, mark_scheme, posted_at FROM answer_keys WHERE guild_id = ?",
+                (guild_id,)).fetchone()
+        if not row:
+            return None
+        return {'subject': row[0], 'question_text': row[1], 'mark_scheme': row[2], 'posted_at': row[3]}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_schedule_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ScheduleStore()
+        return _store
+
+
+class DailyScheduler:
+    """Posts each server's daily question at its wall-clock time.
+
+    Schedules live in SQLite, so a restart neither resets nor shifts them and
+    a post missed while the bot was down goes out on the next tick. Subjects
+    are taken in rotation and questions come from the warm pool in
+    question_pool. Posts are built during the off-peak window (or
+    shortly before they are due if that was missed) and stored, so at post
+    time the only work left is the upload. A schedule whose channel is gone
+    or closed to the bot is disabled until /dailyquestion sets it again.
+    """
+
+    def __init__(self, bot, store=None, window=SCHEDULE_PREPARE_WINDOW,
+                 lead_minutes=SCHEDULE_PREPARE_LEAD_MINUTES, clock=discord.utils.utcnow):
+        self.bot = bot
+        self.store = store or get_schedule_store()
+        self.window = parse_window(window)
+        self.lead = dt.timedelta(minutes=lead_minutes)
+        self._clock = clock
+        self._busy = {}  # guild id -> task preparing or posting for it
+        self._retry_at = {}  # guild id -> monotonic time before which it is skipped
+
+    def start(self):
+        if not self._tick_loop.is_running():
+            self._tick_loop.start()
+
+    @tasks.loop(minutes=1)
+    async def _tick_loop(self):
+        await self.tick()
+
+    async def tick(self):
+        now = self._clock()
+        off_peak = in_window(now, self.window)
+        for schedule in self.store.all():
+            if schedule['disabled_reason']:
+                continue
+            guild_id = schedule['guild_id']
+            task = self._busy.get(guild_id)
+            if (task and not task.done()) or self._retry_at.get(guild_id, 0) > time.monotonic():
+                continue
+            slot, due = pending_slot(schedule, now)
+            if not due:
+                soon = slot_start(slot, parse_time(schedule['post_time'])) - now <= self.lead
+                if not (off_peak or soon) or self.store.prepared(guild_id, slot.isoformat()):
+                    continue
+            self._busy[guild_id] = asyncio.create_task(self._work(schedule, slot, due))
+
+    async def _work(self, schedule, slot, due):
+        guild_id = schedule['guild_id']
+        post_date = slot.isoformat()
+        try:
+            post = self.store.prepared(guild_id, post_date)
+            if post is None:
+                post = await self._prepare(schedule, post_date)
+            if due:
+                await self._post(schedule, post_date, post)
+            elif post is None:
+                self._retry_at[guild_id] = time.monotonic() + SCHEDULE_RETRY_DELAY
+        except (discord.NotFound, discord.Forbidden) as e:
+            # Retrying cannot help once the channel is gone or the bot lost access to it
+            reason = "channel_not_found" if isinstance(e, discord.NotFound) else "forbidden"
+            self.store.disable(guild_id, reason)
+            ERRORS.inc(component="scheduler")
+            logger.warning("daily_question_disabled guild=%s channel=%s reason=%s",
+                           guild_id, schedule['channel_id'], reason)
+        except Exception:
+            self._retry_at[guild_id] = time.monotonic() + SCHEDULE_RETRY_DELAY
+            ERRORS.inc(component="scheduler")
+            logger.exception("daily_question_failed guild=%s date=%s", guild_id, post_date)
+
+    async def _prepare(self, schedule, post_date):
+        subjects = schedule['subjects']
+        subject = subjects[schedule['rotation'] % len(subjects)]
+        exclude = self.store.recent_questions(schedule['guild_id'])
+        # Imported here so loading the bot does not pull in the PDF stack
+        from question_pool import get_pool
+        question = await get_pool().take(subject, exclude, timeout=PREPARE_TIMEOUT)
+        if question is None:
+            return None
+        post = await get_runner().run(build_post, question, subject=subject, timeout=PREPARE_TIMEOUT)
+        if post is not None:
+            self.store.save_prepared(schedule, post_date, post)
+            logger.info("daily_question_prepared guild=%s date=%s subject=%s question=%s",
+                        schedule['guild_id'], post_date, subject, post['question_key'])
+        return post
+
+    async def _post(self, schedule, post_date, post):
+        channel = self.bot.get_channel(schedule['channel_id']) or await self.bot.fetch_channel(schedule['channel_id'])
+        if post is None:
+            await channel.send("⚠️ No theory question found today.")
+        elif post['image']:
+            file = discord.File(io.BytesIO(post['image']), filename=post['filename'])
+            await channel.send(content=post['content'], file=file)
+        else:
+            await channel.send(content=post['content'])
+        self.store.mark_posted(schedule['guild_id'], post_date, post)
+        logger.info("daily_question_posted guild=%s channel=%s date=%s",
+                    schedule['guild_id'], schedule['channel_id'], post_date)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import drive_access  # noqa: E402
+
+
+@pytest.fixture
+def fast_drive_access(monkeypatch):
+    """Shared DriveAccess with no quota wait and no backoff sleeps."""
+    access = drive_access.DriveAccess(
+        limiter=drive_access.TokenBucket(1e9, 10 ** 9),
+        retry=drive_access.RetryPolicy(max_retries=8, sleep=lambda _: None),
+    )
+    monkeypatch.setattr(drive_access, "_access", access)
+    return access
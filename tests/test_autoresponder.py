@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+from autoresponder import Autoresponder
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def write_config(path, keywords, **extra):
+    path.write_text(json.dumps(dict(extra, keywords=keywords)), encoding="utf-8")
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / "keywords.json"
+    write_config(path, [
+        {"keyword": "nerd", "response": "short"},
+        {"keyword": "nerd cafe", "response": "long"},
+        {"keyword": "ib", "response": "ib only here", "guilds": [7]},
+    ], channel_cooldown=30, keyword_cooldown=120)
+    return path
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def responder(config, clock):
+    return Autoresponder(path=str(config), clock=clock)
+
+
+def test_matches_whole_words_only(responder):
+    assert responder.reply_for("any nerds here?", 1, 10) is None
+    assert responder.reply_for("denerd", 1, 11) is None
+    assert responder.reply_for("Ask a NERD.", 1, 12) == "short"
+
+
+def test_longer_keyword_wins(responder):
+    assert responder.reply_for("try nerd   cafe", 1, 10) == "long"
+
+
+def test_guild_specific_rules(responder):
+    assert responder.reply_for("ib notes", 1, 10) is None
+    assert responder.reply_for("ib notes", 7, 20) == "ib only here"
+
+
+def test_channel_and_keyword_cooldowns(responder, clock):
+    assert responder.reply_for("nerd", 1, 10) == "short"
+    # The whole channel is quiet for channel_cooldown
+    assert responder.reply_for("nerd cafe", 1, 10) is None
+    # Other channels are not affected
+    assert responder.reply_for("nerd", 1, 11) == "short"
+
+    clock.now += 31
+    # The channel is free again but "nerd" itself is still cooling down there
+    assert responder.reply_for("nerd", 1, 10) is None
+    assert responder.reply_for("nerd cafe", 1, 10) == "long"
+
+    clock.now += 121
+    assert responder.reply_for("nerd", 1, 10) == "short"
+
+
+def test_cooldown_table_is_bounded(config, clock):
+    responder = Autoresponder(path=str(config), max_cooldowns=4, clock=clock)
+
+    for channel in range(10):
+        responder.reply_for("nerd", 1, channel)
+
+    assert len(responder._cooldowns) == 4
+
+
+def test_reloads_when_the_file_changes(responder, config, clock):
+    write_config(config, [{"keyword": "physics", "response": "phys"}])
+    stat = os.stat(config)
+    os.utime(config, (stat.st_atime, stat.st_mtime + 10))
+
+    clock.now += 10
+    assert responder.reply_for("physics help", 1, 10) == "phys"
+    assert responder.reply_for("nerd", 1, 11) is None
+
+
+def test_invalid_config_keeps_current_rules(responder, config):
+    config.write_text("{not json", encoding="utf-8")
+
+    assert responder.reload() is False
+    assert responder.reply_for("nerd", 1, 10) == "short"
@@ -0,0 +1,75 @@
+import pytest
+
+from catalog import NOTES, PAST_PAPERS, Catalog, Subject, SubjectIndex
+
+
+@pytest.fixture
+def catalog():
+    return Catalog({
+        "subjects": {
+            "mathematics": {"name": "Mathematics", "syllabus": "0580", "aliases": ["math", "maths"],
+                            "theory_papers": [2, 4]},
+            "computer science": {"name": "Computer Science", "aliases": ["cs"]},
+            "chemistry": {"name": "Chemistry", "aliases": ["chem"], "theory_papers": [4]},
+            "history": {"name": "History"},
+        },
+        PAST_PAPERS: {
+            "CIE": {"mathematics": "f-math", "computer science": "f-cs", "chemistry": "f-chem"},
+        },
+        NOTES: {
+            "CIE": {"history": "n-hist"},
+        },
+    })
+
+
+def keys(subjects):
+    return [s.key for s in subjects]
+
+
+def test_canonical_accepts_keys_names_and_aliases(catalog):
+    assert catalog.canonical("Maths") == "mathematics"
+    assert catalog.canonical("  computer-science ") == "computer science"
+    assert catalog.canonical("CS") == "computer science"
+    assert catalog.canonical("art") is None
+
+
+def test_resolve_prefers_an_exact_alias(catalog):
+    assert catalog.resolve(PAST_PAPERS, "CIE", "math").key == "mathematics"
+
+
+def test_resolve_falls_back_to_suggestions(catalog):
+    assert catalog.resolve(PAST_PAPERS, "CIE", "compu").key == "computer science"
+    # Misspelt names are matched on trigrams
+    assert catalog.resolve(PAST_PAPERS, "CIE", "chemestry").key == "chemistry"
+
+
+def test_resolve_only_returns_subjects_on_the_board(catalog):
+    assert catalog.resolve(PAST_PAPERS, "CIE", "history") is None
+    assert catalog.resolve(NOTES, "CIE", "history").key == "history"
+    assert catalog.resolve(PAST_PAPERS, "CIE", "") is None
+
+
+def test_complete_matches_prefixes_of_any_word(catalog):
+    assert keys(catalog.complete(PAST_PAPERS, "CIE", "sci")) == ["computer science"]
+    assert keys(catalog.complete(PAST_PAPERS, "CIE", "comp sci")) == ["computer science"]
+    assert keys(catalog.complete(PAST_PAPERS, "CIE", "")) == ["chemistry", "computer science", "mathematics"]
+
+
+def test_trigram_matching_ignores_weak_matches():
+    index = SubjectIndex([Subject("physics", "Physics"), Subject("geography", "Geography")])
+
+    assert keys(index.complete("physcis")) == ["physics"]
+    assert index.complete("xyzzy") == []
+
+
+def test_long_queries_still_match_by_substring():
+    index = SubjectIndex([Subject("information technology", "Information Technology")])
+
+    assert keys(index.complete("information techn")) == ["information technology"]
+
+
+def test_legacy_names_and_theory_papers(catalog):
+    assert catalog.legacy_names()["maths"] == "mathematics"
+    assert "mathematics" not in catalog.legacy_names()
+    assert catalog.theory_papers() == {"mathematics": {2, 4}, "chemistry": {4}}
+    assert catalog.folder_id(PAST_PAPERS, "CIE", "chem") == "f-chem"
@@ -0,0 +1,120 @@
+import io
+import threading
+import time
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from benchmarks.fake_drive import FakeDrive, _Response
+from drive_access import RetryPolicy, SingleFlight, execute, get_drive_access
+
+
+def http_error(status, reason=None):
+    content = b'{"error": {"errors": [{"reason": "%s"}]}}' % (reason or "x").encode()
+    return HttpError(_Response(status), content)
+
+
+class FlakyCall:
+    def __init__(self, errors, result="ok"):
+        self.errors = list(errors)
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+def test_retry_recovers_from_transient_errors():
+    call = FlakyCall([http_error(503), http_error(429), http_error(403, "userRateLimitExceeded")])
+    policy = RetryPolicy(sleep=lambda _: None)
+    assert policy.call(call) == "ok"
+    assert call.calls == 4
+    assert policy.retries == 3
+
+
+def test_retry_does_not_retry_client_errors():
+    call = FlakyCall([http_error(404)])
+    with pytest.raises(HttpError):
+        RetryPolicy(sleep=lambda _: None).call(call)
+    assert call.calls == 1
+
+
+def test_retry_gives_up_after_max_retries():
+    call = FlakyCall([http_error(503)] * 5)
+    with pytest.raises(HttpError):
+        RetryPolicy(max_retries=2, sleep=lambda _: None).call(call)
+    assert call.calls == 3
+
+
+def test_backoff_is_capped():
+    delays = []
+    call = FlakyCall([http_error(500)] * 6)
+    RetryPolicy(max_retries=6, base_delay=1.0, max_delay=4.0, sleep=delays.append).call(call)
+    assert len(delays) == 6
+    assert all(0 <= d <= 4.0 for d in delays)
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "shared"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(4)]
+    for t in followers:
+        t.start()
+    deadline = time.monotonic() + 5
+    while flight.coalesced < 4 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for t in [leader] + followers:
+        t.join(5)
+    assert results == ["shared"] * 5
+    assert len(calls) == 1
+
+
+def test_single_flight_shares_errors_and_forgets_them():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("k", FlakyCall([ValueError("boom")]))
+    assert flight.do("k", lambda: "fresh") == "fresh"
+
+
+def test_execute_against_failing_drive(fast_drive_access):
+    drive = FakeDrive(fail_rate=0.3, seed=1)
+    root = drive.add_folder("root", parent="root")
+    ids = {drive.add_pdf(f"p{i}.pdf", root, b"%PDF-" + bytes([i])) for i in range(20)}
+    listed = set()
+    token = None
+    while True:
+        response = execute(drive.files().list(q=f"'{root}' in parents", pageSize=7, pageToken=token))
+        listed |= {f['id'] for f in response['files']}
+        token = response.get('nextPageToken')
+        if not token:
+            break
+    assert listed == ids
+    assert drive.failures > 0
+    assert get_drive_access().stats()['retries'] == drive.failures
+
+
+def test_download_resumes_failed_chunks(fast_drive_access):
+    drive = FakeDrive(fail_rate=0.3, seed=2)
+    data = bytes(range(256)) * 40
+    file_id = drive.add_pdf("big.pdf", "root", data)
+    fh = io.BytesIO()
+    get_drive_access().download(drive.files().get_media(fileId=file_id), fh, chunksize=1000)
+    assert fh.getvalue() == data
+    assert drive.failures > 0
@@ -0,0 +1,73 @@
+import pytest
+
+from benchmarks.fake_drive import FakeDrive
+from drive_index import DriveIndex
+from drive_scanner import DriveScanner
+
+
+@pytest.fixture
+def drive():
+    return FakeDrive(fail_rate=0.2, seed=3)
+
+
+@pytest.fixture
+def index(tmp_path, fast_drive_access):
+    index = DriveIndex(path=str(tmp_path / "index.db"), sync_interval=0, scanner=DriveScanner())
+    yield index
+    index.close()
+
+
+def names(index, folder_id):
+    return sorted(f['name'] for f in index.list_pdfs(folder_id))
+
+
+def test_add_root_mirrors_nested_tree(drive, index):
+    root = drive.add_folder("maths", parent="root")
+    year = drive.add_folder("2023", parent=root)
+    drive.add_pdf("a.pdf", root, b"a")
+    drive.add_pdf("b.pdf", year, b"b")
+    drive.add_pdf("elsewhere.pdf", "root", b"c")
+
+    index.add_root(drive, root)
+
+    assert index.has_root(root)
+    assert names(index, root) == ["a.pdf", "b.pdf"]
+    assert index.generation == 1
+
+
+def test_sync_applies_additions_and_removals(drive, index):
+    root = drive.add_folder("maths", parent="root")
+    old = drive.add_pdf("old.pdf", root, b"old")
+    index.add_root(drive, root)
+
+    year = drive.add_folder("2024", parent=root)
+    drive.add_pdf("new.pdf", year, b"new")
+    drive.remove(old)
+    drive.add_pdf("untracked.pdf", "root", b"x")
+
+    applied = index.sync(drive)
+
+    assert applied == 3
+    assert names(index, root) == ["new.pdf"]
+    assert index.generation == 2
+
+
+def test_sync_without_changes_keeps_generation(drive, index):
+    root = drive.add_folder("maths", parent="root")
+    drive.add_pdf("a.pdf", root, b"a")
+    index.add_root(drive, root)
+
+    assert index.sync(drive) == 0
+    assert index.generation == 1
+
+
+def test_removing_a_folder_drops_its_subtree(drive, index):
+    root = drive.add_folder("maths", parent="root")
+    year = drive.add_folder("2022", parent=root)
+    drive.add_pdf("a.pdf", year, b"a")
+    index.add_root(drive, root)
+
+    drive.remove(year)
+    index.sync(drive)
+
+    assert names(index, root) == []
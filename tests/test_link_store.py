@@ -0,0 +1,73 @@
+import pytest
+
+from link_store import STATUS_PENDING, LinkStore, normalize_link
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LinkStore(path=str(tmp_path / "links.db"))
+
+
+@pytest.mark.parametrize("a, b", [
+    ("https://Example.com/notes/", "https://example.com/notes"),
+    ("http://example.com:80/notes", "https://example.com/notes"),
+    ("https://example.com/n?b=2&a=1", "https://example.com/n?a=1&b=2"),
+    ("https://example.com/n?utm_source=x&usp=sharing&id=4", "https://example.com/n?id=4"),
+    ("  Chapter 3   summary ", "chapter 3 summary"),
+])
+def test_normalize_link_folds_equivalent_forms(a, b):
+    assert normalize_link(a) == normalize_link(b)
+
+
+def test_normalize_link_keeps_meaningful_differences():
+    assert normalize_link("https://example.com/a") != normalize_link("https://example.com/b")
+    assert normalize_link("https://example.com/n?id=1") != normalize_link("https://example.com/n?id=2")
+
+
+def test_add_deduplicates_per_subject(store):
+    first, created = store.add("igcse", "physics", "https://example.com/notes")
+    again, created_again = store.add("igcse", "physics", "https://EXAMPLE.com/notes/?utm_medium=x")
+    _, other_subject = store.add("igcse", "chemistry", "https://example.com/notes")
+
+    assert created and not created_again
+    assert again == first
+    assert other_subject
+    assert store.count("igcse", "physics") == 1
+
+
+def test_page_walks_links_with_a_cursor(store):
+    for n in range(25):
+        store.add("igcse", "physics", f"https://example.com/{n}")
+
+    links, cursor = store.page("igcse", "physics", limit=10)
+    seen = [content for _, content in links]
+    while cursor is not None:
+        links, cursor = store.page("igcse", "physics", after=cursor, limit=10)
+        seen += [content for _, content in links]
+
+    assert seen == [f"https://example.com/{n}" for n in range(25)]
+
+
+def test_page_only_shows_approved_links_and_sees_writes(store):
+    store.add("igcse", "physics", "https://example.com/a")
+    assert len(store.page("igcse", "physics")[0]) == 1
+
+    link_id, _ = store.add("igcse", "physics", "https://example.com/b", status=STATUS_PENDING)
+    assert len(store.page("igcse", "physics")[0]) == 1
+
+    store.set_status(link_id, "approved")
+    assert len(store.page("igcse", "physics")[0]) == 2
+
+
+def test_subject_key_migration_runs_once(store):
+    store.add("igcse", "maths", "https://example.com/a")
+    store.add("igcse", "maths", "https://example.com/b")
+    store.add("igcse", "mathematics", "https://example.com/b")
+
+    assert store.migrate_subject_keys({"maths": "mathematics"}) == 1
+    assert store.count("igcse", "mathematics") == 2
+    assert store.count("igcse", "maths") == 0
+
+    store.add("igcse", "maths", "https://example.com/c")
+    assert store.migrate_subject_keys({"maths": "mathematics"}) == 0
+    assert store.count("igcse", "maths") == 1
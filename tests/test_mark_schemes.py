@@ -0,0 +1,59 @@
+from contextlib import nullcontext
+
+import pytest
+
+import mark_schemes
+from benchmarks.synthetic_corpus import make_mark_scheme
+from mark_schemes import MarkSchemeCache, extract_mark_scheme, load_mark_scheme, slice_for_question
+
+
+@pytest.fixture
+def scheme_path(tmp_path):
+    path = tmp_path / "0580_s23_ms_42.pdf"
+    path.write_bytes(make_mark_scheme(path.name, questions=12))
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = MarkSchemeCache(path=str(tmp_path / "ms.db"))
+    monkeypatch.setattr(mark_schemes, "_cache", cache)
+    return cache
+
+
+def test_extract_splits_rows_per_question(scheme_path):
+    text, slices = extract_mark_scheme(scheme_path)
+
+    assert sorted(slices) == list(range(1, 13))
+    assert "Generic Marking Principles" in text
+    assert "Generic Marking Principles" not in slices[1]
+    assert slices[3].splitlines()[0] == "3(a)"
+    assert "4(a)" not in slices[3]
+    # The questions spill onto a second page and keep their numbering
+    assert "12(c)" in slices[12]
+
+
+def test_slice_for_question_falls_back_to_full_text():
+    slices = {1: "1(a) x = 3"}
+
+    assert slice_for_question("all", slices, 1) == "1(a) x = 3"
+    assert slice_for_question("all", slices, 2) == "all"
+    assert slice_for_question("all", slices, None) == "all"
+
+
+def test_load_extracts_once_per_md5(scheme_path, cache):
+    calls = []
+
+    def fetch(file):
+        calls.append(file['md5Checksum'])
+        return nullcontext(scheme_path)
+
+    file = {'id': "ms1", 'md5Checksum': "v1"}
+    first = load_mark_scheme(file, fetch)
+    second = load_mark_scheme(file, fetch)
+    load_mark_scheme(dict(file, md5Checksum="v2"), fetch)
+
+    assert first == second
+    assert calls == ["v1", "v2"]
+    assert cache.get("ms1", "v1") is None
+    assert cache.get("ms1", "v2")[1][1] == first[1][1]
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from marking_service import MarkingService, MarkingServiceClosed, RetryableMarkingError
+
+
+class StubBackend:
+    """Records the order prompts are served in; can fail the first few calls."""
+
+    def __init__(self, delay=0.001, failures=0):
+        self.delay = delay
+        self.failures = failures
+        self.prompts = []
+
+    async def complete(self, prompt):
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise RetryableMarkingError("rate limited")
+        self.prompts.append(prompt)
+        return f"mark {len(self.prompts)}", {'prompt_tokens': 10, 'completion_tokens': 2}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def answer_of(prompt):
+    return next(line for line in prompt.splitlines() if line.startswith("ans-"))
+
+
+async def _mark_all(service, requests):
+    try:
+        return await asyncio.gather(*(service.mark(user, "question", answer, "scheme")
+                                      for user, answer in requests))
+    finally:
+        await service.close()
+
+
+def test_users_are_served_round_robin():
+    backend = StubBackend()
+    service = MarkingService(backend=backend, concurrency=1)
+    requests = [("flood", f"ans-flood-{i}") for i in range(8)] + [("a", "ans-a-0"), ("b", "ans-b-0")]
+
+    run(_mark_all(service, requests))
+
+    served = [answer_of(p) for p in backend.prompts]
+    assert len(served) == 10
+    # The quiet users are not stuck behind the whole backlog of the busy one
+    assert served.index("ans-a-0") <= 2
+    assert served.index("ans-b-0") <= 3
+
+
+def test_identical_requests_hit_the_cache():
+    backend = StubBackend()
+    service = MarkingService(backend=backend, concurrency=2)
+
+    async def scenario():
+        first = await service.mark(1, "question", "ans-x", "scheme")
+        second = await service.mark(2, "question", "  ans-x ", "scheme")
+        await service.close()
+        return first, second
+
+    first, second = run(scenario())
+    assert first == second
+    assert len(backend.prompts) == 1
+    assert service.metrics()['cache_hits'] == 1
+
+
+def test_answers_differing_in_case_are_marked_separately():
+    backend = StubBackend()
+    service = MarkingService(backend=backend, concurrency=1)
+
+    run(_mark_all(service, [(1, "ans-CO"), (1, "ans-Co")]))
+
+    assert len(backend.prompts) == 2
+
+
+def test_concurrent_identical_requests_share_one_call():
+    backend = StubBackend(delay=0.01)
+    service = MarkingService(backend=backend, concurrency=4)
+
+    results = run(_mark_all(service, [(user, "ans-same") for user in range(5)]))
+
+    assert len(set(results)) == 1
+    assert len(backend.prompts) == 1
+    assert service.metrics()['coalesced'] == 4
+
+
+def test_cache_is_bounded():
+    backend = StubBackend()
+    service = MarkingService(backend=backend, concurrency=1, cache_size=2)
+
+    run(_mark_all(service, [(1, f"ans-{i}") for i in range(4)]))
+
+    assert service.metrics()['cache_entries'] == 2
+
+
+def test_retryable_errors_are_retried():
+    backend = StubBackend(failures=2)
+    service = MarkingService(backend=backend, concurrency=1, base_delay=0, max_delay=0)
+
+    assert run(_mark_all(service, [(1, "ans-r")])) == ["mark 1"]
+    assert service.metrics()['retries'] == 2
+
+
+def test_errors_reach_the_caller_after_max_retries():
+    backend = StubBackend(failures=10)
+    service = MarkingService(backend=backend, concurrency=1, max_retries=1, base_delay=0, max_delay=0)
+
+    with pytest.raises(RetryableMarkingError):
+        run(_mark_all(service, [(1, "ans-e")]))
+
+
+def test_close_fails_pending_requests():
+    backend = StubBackend(delay=0.05)
+    service = MarkingService(backend=backend, concurrency=1)
+
+    async def scenario():
+        pending = [asyncio.ensure_future(service.mark(user, "question", f"ans-{user}", "scheme"))
+                   for user in range(3)]
+        await asyncio.sleep(0.01)
+        await service.close()
+        return await asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), 1)
+
+    results = run(scenario())
+
+    # One request was with the backend, the other two were still queued
+    assert all(isinstance(r, MarkingServiceClosed) for r in results)
+    assert service.metrics()['queued'] == 0
@@ -0,0 +1,59 @@
+import pytest
+
+from paper_codes import PaperIndex, parse_paper_name
+
+
+def test_parse_question_paper():
+    record = parse_paper_name("0580_s23_qp_42.pdf")
+
+    assert record.syllabus == "0580"
+    assert record.session == "s"
+    assert record.year == 2023
+    assert record.doc_type == "qp"
+    assert (record.paper, record.variant) == (4, 2)
+    assert record.file == {'name': "0580_s23_qp_42.pdf"}
+
+
+def test_parse_is_case_insensitive_and_strips_whitespace():
+    record = parse_paper_name(" 0625_W19_MS_31.PDF ")
+
+    assert record.key == ("0625", "w", 2019, "ms", 3, 1)
+
+
+def test_parse_sitting_wide_documents_have_no_paper():
+    record = parse_paper_name("0620_m21_er.pdf")
+
+    assert record.doc_type == "er"
+    assert (record.paper, record.variant) == (0, 0)
+
+
+def test_parse_paper_without_variant():
+    assert parse_paper_name("0417_s22_qp_1.pdf").key == ("0417", "s", 2022, "qp", 1, 0)
+
+
+@pytest.mark.parametrize("name", [
+    "maths paper 2.pdf",
+    "0580_s23_qp_42.docx",
+    "580_s23_qp_42.pdf",
+    "0580_x23_qp_42.pdf",
+    "0580_s23_qp_423.pdf",
+])
+def test_parse_rejects_other_names(name):
+    assert parse_paper_name(name) is None
+
+
+def test_index_matches_mark_scheme_and_theory_papers():
+    files = [{'id': str(i), 'name': name} for i, name in enumerate([
+        "0580_s23_qp_22.pdf",
+        "0580_s23_ms_22.pdf",
+        "0580_s23_qp_12.pdf",
+        "0580_s23_gt.pdf",
+        "notes.pdf",
+    ])]
+    index = PaperIndex({"mathematics": {2, 4}}).add_all("mathematics", files)
+
+    theory = index.theory_for("mathematics")
+    assert [r.file['id'] for r in theory] == ["0"]
+    assert index.mark_scheme_for(theory[0]).file['id'] == "1"
+    assert len(index.sitting("mathematics", 2023, "s")) == 4
+    assert index.lookup("0580", "s", 2023, "qp", 1, 2).file['id'] == "2"
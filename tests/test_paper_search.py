@@ -0,0 +1,41 @@
+from contextlib import nullcontext
+
+import pytest
+
+from benchmarks.synthetic_corpus import make_question_paper
+from paper_search import PaperSearchIndex, build_match
+
+
+@pytest.fixture
+def index(tmp_path):
+    return PaperSearchIndex(path=str(tmp_path / "search.db"), workers=1)
+
+
+def add_paper(tmp_path, index, file_id, name, md5="v1"):
+    path = tmp_path / name
+    path.write_bytes(make_question_paper(name))
+    return index.update("mathematics", [{'id': file_id, 'name': name, 'md5Checksum': md5}],
+                        lambda f: nullcontext(str(path)))
+
+
+def test_build_match_prefixes_the_last_word():
+    assert build_match("Moles of gas") == '"moles" "of" "gas"*'
+    assert build_match("  ?! ") is None
+
+
+def test_search_and_complete_see_committed_batches(tmp_path, index):
+    assert index.search("calculate") == []
+
+    add_paper(tmp_path, index, "a", "0580_s23_qp_42.pdf")
+
+    hits = index.search("calculate", subject="mathematics")
+    assert hits and hits[0]['paper'] == "0580/42 May/June 2023"
+    assert index.complete("value of calc") == ["value of calculate"]
+
+
+def test_reads_do_not_wait_for_the_writer_lock(tmp_path, index):
+    add_paper(tmp_path, index, "a", "0580_s23_qp_42.pdf")
+
+    with index._lock:
+        assert index.search("calculate")
+        assert index.suggest("calc") == ["calculate"]
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from benchmarks.fake_drive import FakeDrive
+from pdf_cache import PdfCache
+
+
+@pytest.fixture
+def drive():
+    return FakeDrive()
+
+
+@pytest.fixture
+def cache(tmp_path, fast_drive_access):
+    return PdfCache(root=str(tmp_path / "pdfs"), max_bytes=250, chunk_size=64)
+
+
+def add(drive, name, size=100):
+    file_id = drive.add_pdf(name, "root", b"x" * size)
+    return drive.items[file_id]
+
+
+def test_hit_reuses_downloaded_file(drive, cache):
+    f = add(drive, "a.pdf")
+
+    first = cache.fetch(drive, f)
+    second = cache.fetch(drive, f)
+
+    assert first == second
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_evicts_least_recently_used(drive, cache):
+    a, b, c = (add(drive, name) for name in ("a.pdf", "b.pdf", "c.pdf"))
+    path_a = cache.fetch(drive, a)
+    path_b = cache.fetch(drive, b)
+    cache.fetch(drive, a)  # a is now newer than b
+
+    cache.fetch(drive, c)
+
+    assert os.path.exists(path_a)
+    assert not os.path.exists(path_b)
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] <= 250
+
+
+def test_pinned_files_survive_eviction_until_released(drive, cache):
+    a, b, c = (add(drive, name) for name in ("a.pdf", "b.pdf", "c.pdf"))
+
+    with cache.pinned(drive, a) as path_a, cache.pinned(drive, b) as path_b:
+        cache.fetch(drive, c)
+        assert os.path.exists(path_a) and os.path.exists(path_b)
+        assert cache.stats()['pinned'] == 2
+        assert cache.stats()['bytes'] == 300
+
+    # b is released first while a is still pinned, so b is the one evicted
+    assert cache.stats()['pinned'] == 0
+    assert os.path.exists(path_a)
+    assert not os.path.exists(path_b)
+    assert cache.stats()['bytes'] <= 250
+
+
+def test_pins_are_counted(drive, cache):
+    a = add(drive, "a.pdf")
+    path = cache.fetch(drive, a, pin=True)
+    cache.fetch(drive, a, pin=True)
+
+    cache.release(path)
+    assert cache.stats()['pinned'] == 1
+    cache.release(path)
+    assert cache.stats()['pinned'] == 0
+
+
+def test_new_md5_is_a_new_entry(drive, cache):
+    a = add(drive, "a.pdf")
+    old = cache.fetch(drive, a)
+
+    changed = dict(a, md5Checksum="changed")
+    new = cache.fetch(drive, changed)
+
+    assert new != old
+    assert cache.stats()['misses'] == 2
+
+
+def test_reload_restores_entries(drive, cache):
+    a = add(drive, "a.pdf")
+    cache.fetch(drive, a)
+
+    reloaded = PdfCache(root=cache.root, max_bytes=250)
+
+    assert reloaded.stats()['entries'] == 1
+    assert reloaded.stats()['bytes'] == 100
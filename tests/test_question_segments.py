@@ -0,0 +1,102 @@
+from contextlib import nullcontext
+
+import fitz
+import pytest
+
+from benchmarks.synthetic_corpus import make_question_paper
+from question_segments import SegmentIndex, first_question_page, segment_paper
+
+
+def write_paper(tmp_path, name, **kwargs):
+    path = tmp_path / name
+    path.write_bytes(make_question_paper(name, **kwargs))
+    return str(path)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SegmentIndex(path=str(tmp_path / "segments.db"), workers=1, batch_size=2)
+    yield index
+    index._db.close()
+
+
+def test_segment_paper_finds_numbered_questions(tmp_path):
+    path = write_paper(tmp_path, "0580_s23_qp_42.pdf", questions=6, pages=4)
+
+    questions = segment_paper(path)
+
+    assert [q["number"] for q in questions] == [1, 2, 3, 4, 5, 6]
+    # The cover page is never part of a question
+    assert all(span[0] >= 1 for q in questions for span in q["spans"])
+
+
+def test_segment_paper_ignores_out_of_order_numbers(tmp_path):
+    doc = fitz.open()
+    doc.new_page()
+    page = doc.new_page()
+    page.insert_text((40, 100), "1", fontsize=11)
+    page.insert_text((72, 100), "(a) State the formula.", fontsize=10)
+    page.insert_text((40, 300), "7", fontsize=11)
+    page.insert_text((72, 300), "marks left in the margin", fontsize=10)
+    page.insert_text((40, 500), "2", fontsize=11)
+    page.insert_text((72, 500), "(a) Calculate the area.", fontsize=10)
+    path = str(tmp_path / "paper.pdf")
+    doc.save(path)
+    doc.close()
+
+    assert [q["number"] for q in segment_paper(path)] == [1, 2]
+
+
+def test_first_question_page_skips_cover_and_blank_pages(tmp_path):
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 120), "Cambridge IGCSE", fontsize=16)
+    doc.new_page().insert_text((250, 400), "BLANK PAGE", fontsize=12)
+    doc.new_page().insert_text((72, 100), "Formulae sheet", fontsize=10)
+    question = doc.new_page()
+    question.insert_text((40, 100), "1", fontsize=11)
+    question.insert_text((72, 100), "(a) Work out 3 + 4.", fontsize=10)
+    path = str(tmp_path / "paper.pdf")
+    doc.save(path)
+    doc.close()
+
+    assert first_question_page(path) == 3
+
+
+def test_update_only_segments_new_or_changed_papers(tmp_path, index):
+    paths = {}
+    files = []
+    for n in range(3):
+        name = f"0580_s23_qp_4{n + 1}.pdf"
+        paths[f"f{n}"] = write_paper(tmp_path, name, questions=4, pages=3)
+        files.append({'id': f"f{n}", 'name': name, 'md5Checksum': "v1"})
+    fetched = []
+
+    def fetch(file):
+        fetched.append(file['id'])
+        return nullcontext(paths[file['id']])
+
+    assert index.update("mathematics", files, fetch) == 3
+    assert index.count("mathematics") == 12
+
+    files[0] = dict(files[0], md5Checksum="v2")
+    del files[2]
+    fetched.clear()
+
+    assert index.update("mathematics", files, fetch) == 1
+    assert fetched == ["f0"]
+    assert index.count("mathematics") == 8
+    assert set(index.known_papers("mathematics")) == {"f0", "f1"}
+
+
+def test_random_question_honours_exclude(tmp_path, index):
+    path = write_paper(tmp_path, "0580_s23_qp_42.pdf", questions=3, pages=3)
+    index.update("mathematics", [{'id': "f0", 'name': "0580_s23_qp_42.pdf"}], lambda f: nullcontext(path))
+
+    exclude = {("f0", 1), ("f0", 3)}
+    picks = {index.random_question("mathematics", exclude=exclude)['number'] for _ in range(20)}
+    assert picks == {2}
+
+    # Once everything is excluded any question may come back
+    everything = exclude | {("f0", 2)}
+    assert index.random_question("mathematics", exclude=everything) is not None
+    assert index.random_question("physics") is None
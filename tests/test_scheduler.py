@@ -0,0 +1,164 @@
+import asyncio
+import datetime as dt
+import sqlite3
+
+import discord
+import pytest
+
+import question_pool
+from drive_utils import PreparedQuestion
+from scheduler import DailyScheduler, ScheduleStore, pending_slot
+
+UTC = dt.timezone.utc
+
+
+def at(day, hour, minute=0):
+    return dt.datetime(2026, 10, day, hour, minute, tzinfo=UTC)
+
+
+def schedule(post_time="09:00", last_posted=None):
+    return {'post_time': post_time, 'last_posted': last_posted}
+
+
+class FakeResponse:
+    status = 404
+    reason = "Not Found"
+
+
+class Channel:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    async def send(self, content=None, file=None):
+        if self.error:
+            raise self.error
+        self.sent.append(content)
+
+
+class Bot:
+    def __init__(self, channel):
+        self.channel = channel
+
+    def get_channel(self, channel_id):
+        return self.channel
+
+
+class Pool:
+    """Stands in for the warm question pool, handing out numbered questions."""
+
+    def __init__(self):
+        self.excludes = []
+
+    async def take(self, subject, exclude=(), timeout=None):
+        self.excludes.append(set(exclude))
+        number = next(n for n in range(1, 100) if f"paper#{n}" not in exclude)
+        return PreparedQuestion(subject, b"png", f"Question {number}", {'id': "paper"}, None,
+                                question_number=number)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScheduleStore(path=str(tmp_path / "schedules.db"))
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = Pool()
+    monkeypatch.setattr(question_pool, "_pool", pool)
+    return pool
+
+
+def run_tick(scheduler):
+    async def tick():
+        await scheduler.tick()
+        await asyncio.gather(*scheduler._busy.values())
+    asyncio.run(tick())
+    # Tasks are bound to the loop that just closed
+    scheduler._busy.clear()
+
+
+def test_pending_slot_before_and_after_post_time():
+    assert pending_slot(schedule(last_posted="2026-10-16"), at(17, 8)) == (dt.date(2026, 10, 17), False)
+    assert pending_slot(schedule(last_posted="2026-10-16"), at(17, 9)) == (dt.date(2026, 10, 17), True)
+    assert pending_slot(schedule(last_posted="2026-10-17"), at(17, 10)) == (dt.date(2026, 10, 18), False)
+
+
+def test_pending_slot_catches_up_only_the_latest_missed_post():
+    assert pending_slot(schedule(last_posted="2026-10-10"), at(17, 8)) == (dt.date(2026, 10, 16), True)
+    assert pending_slot(schedule(), at(17, 8)) == (dt.date(2026, 10, 16), True)
+
+
+def test_new_schedule_waits_for_the_next_post_time(store):
+    saved = store.set(1, 10, ["mathematics"], "09:00", now=at(17, 10))
+
+    assert pending_slot(saved, at(17, 10)) == (dt.date(2026, 10, 18), False)
+
+
+def test_posted_questions_are_not_repeated(store, pool):
+    clock = [at(17, 10)]
+    channel = Channel()
+    scheduler = DailyScheduler(Bot(channel), store=store, clock=lambda: clock[0])
+    store.set(1, 10, ["mathematics"], "09:00", now=clock[0])
+
+    for day in (18, 19, 20):
+        clock[0] = at(day, 9)
+        run_tick(scheduler)
+
+    assert [c.splitlines()[1] for c in channel.sent] == ["Question 1", "Question 2", "Question 3"]
+    assert pool.excludes == [set(), {"paper#1"}, {"paper#1", "paper#2"}]
+    assert store.recent_questions(1, days=1) == {"paper#1", "paper#2", "paper#3"}
+    assert store.recent_questions(2) == set()
+
+
+def test_missing_channel_disables_the_schedule(store, pool):
+    clock = [at(17, 10)]
+    channel = Channel(error=discord.NotFound(FakeResponse(), "Unknown Channel"))
+    scheduler = DailyScheduler(Bot(channel), store=store, clock=lambda: clock[0])
+    store.set(1, 10, ["mathematics"], "09:00", now=clock[0])
+
+    clock[0] = at(18, 9)
+    run_tick(scheduler)
+    run_tick(scheduler)
+
+    assert store.get(1)['disabled_reason'] == "channel_not_found"
+    assert len(pool.excludes) == 1
+
+    # Setting the schedule again switches it back on
+    assert store.set(1, 11, ["mathematics"], "09:00", now=clock[0])['disabled_reason'] is None
+
+
+def test_answer_key_follows_the_latest_post(store):
+    store.set(1, 10, ["mathematics"], "09:00", now=at(17, 10))
+    post = {'subject': "mathematics", 'question_key': "paper#1", 'question_text': "Q1", 'mark_scheme': "1(a) 4"}
+
+    store.mark_posted(1, "2026-10-18", post)
+    assert store.answer_key(1)['mark_scheme'] == "1(a) 4"
+
+    store.mark_posted(1, "2026-10-19", dict(post, question_key="paper#2", mark_scheme=None))
+    assert store.answer_key(1) is None
+
+
+def test_existing_databases_are_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE schedules (guild_id INTEGER PRIMARY KEY, channel_id INTEGER NOT NULL,
+            subjects TEXT NOT NULL, post_time TEXT NOT NULL, rotation INTEGER NOT NULL DEFAULT 0,
+            last_posted TEXT, updated_at REAL NOT NULL);
+        CREATE TABLE prepared_posts (guild_id INTEGER NOT NULL, post_date TEXT NOT NULL,
+            subject TEXT NOT NULL, question_key TEXT, content TEXT NOT NULL, image BLOB,
+            filename TEXT, prepared_at REAL NOT NULL, PRIMARY KEY (guild_id, post_date));
+        INSERT INTO schedules VALUES (1, 10, '["physics"]', '09:00', 3, '2026-10-16', 0);
+    """)
+    db.close()
+
+    store = ScheduleStore(path=path)
+
+    assert store.get(1)['rotation'] == 3
+    assert store.get(1)['disabled_reason'] is None
+    saved = store.save_prepared(store.get(1), "2026-10-17", {
+        'subject': "physics", 'question_key': "p#1", 'content': "c", 'image': None, 'filename': "q.png",
+        'question_text': "Q", 'mark_scheme': "MS"})
+    assert saved
+    assert store.prepared(1, "2026-10-17")['mark_scheme'] == "MS"